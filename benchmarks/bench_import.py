@@ -0,0 +1,90 @@
+""" Cold-start benchmark: import cost of the project's entry points, measured with python -X importtime.
+
+Each module is imported in a fresh interpreter (best of --repeat runs) and the cumulative import
+time is reported together with the heaviest dependencies it pulls in, so a regression such as
+an eager pandas import shows up by name. Keep the --json output to track startup over time.
+
+    python benchmarks/bench_import.py [--repeat 5] [--top 5] [--json results.json] [module ...]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+default_modules = ["weather_api", "main_cmd", "weather_records", "weather_cities", "weather_api_async"]
+
+# dependencies worth naming in the report when they end up on the import path
+heavy_modules = ["requests", "numpy", "pandas", "pyarrow", "aiohttp", "streamlit", "sqlite3"]
+
+
+def import_times(module):
+    """ Run 'import module' in a fresh interpreter.
+    Returns:
+        {imported module name: (self us, cumulative us)} for module and everything its import pulled in,
+        interpreter startup (site, .pth hooks) is left out
+    """
+    env = dict(os.environ, PYTHONPATH=root + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               cwd=root, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr[-2000:]}")
+
+    entries = []
+    for line in completed.stderr.splitlines():
+        # "import time:       302 |       8374 |   concurrent.futures", nested imports are indented
+        # and listed before the module that imported them
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append((len(name) - len(name.lstrip()), name.strip(), int(self_us), int(cumulative_us)))
+
+    end = max(i for i, entry in enumerate(entries) if entry[1] == module)
+    start = end
+    while start > 0 and entries[start - 1][0] > entries[end][0]:
+        start -= 1
+    return {name: (self_us, cumulative_us) for _, name, self_us, cumulative_us in entries[start:end + 1]}
+
+
+def measure(module, repeat, top):
+    runs = [import_times(module) for _ in range(repeat)]
+    best = min(runs, key=lambda times: times[module][1])
+
+    others = [(name, cumulative) for name, (_, cumulative) in best.items() if name != module]
+    heaviest = sorted(others, key=lambda item: -item[1])[:top]
+    return {
+        "module": module,
+        "cumulative_ms": round(best[module][1] / 1000, 2),
+        "modules_imported": len(best),
+        "heavy_dependencies": sorted(name for name in heavy_modules if name in best),
+        "heaviest": [{"module": name, "cumulative_ms": round(us / 1000, 2)} for name, us in heaviest],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=default_modules, help="modules to import")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per module, the best run counts")
+    parser.add_argument("--top", type=int, default=5, help="heaviest dependencies listed per module")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for module in args.modules:
+        result = measure(module, args.repeat, args.top)
+        results.append(result)
+        heavy = ", ".join(result["heavy_dependencies"]) or "-"
+        print(f"{module:<20} {result['cumulative_ms']:8.1f} ms  {result['modules_imported']:4d} modules  "
+              f"heavy: {heavy}")
+        for item in result["heaviest"]:
+            print(f"    {item['module']:<40} {item['cumulative_ms']:8.1f} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
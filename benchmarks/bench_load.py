@@ -0,0 +1,243 @@
+""" End-to-end load benchmark of weather_api against the local stub server (stub_server.py).
+
+Drives get_current_data, get_forecast_data, the bulk functions and the parsers at several
+concurrency levels and reports p50/p99 latency, requests per second and the process' peak RSS
+after each scenario (cumulative: it only grows, so it shows which scenario raised it, not what each
+one uses on its own). The bulk scenarios are one call for the whole batch, so they report throughput
+only. No network or API key is needed; --base-url points it at an already running server instead.
+
+    python benchmarks/bench_load.py [--requests 400] [--concurrency 1,8,32] [--latency 20] [--jitter 10]
+                                    [--json results.json] [--compare previous.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import weather_api
+from stub_server import StubServer
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def peak_rss_mb():
+    """ Peak resident set size of this process so far, None where the platform can't tell """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def reset_caches():
+    """ Every scenario starts cold: no cached results, no nearby reuse, no shared disk state """
+    weather_api.response_cache.clear()
+    weather_api._grids.clear()
+    weather_api.disable_disk_cache()
+    weather_api.disable_history()
+    weather_api.disable_rate_limit()
+
+
+def run_calls(call, items, concurrency):
+    """ Run call(item) for every item on concurrency threads.
+    Returns:
+        (latencies in seconds, failures, wall seconds)
+    """
+    def timed(item):
+        started = time.perf_counter()
+        result = call(item)
+        return time.perf_counter() - started, result["success"]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(timed, items))
+    wall = time.perf_counter() - started
+    return [latency for latency, _ in outcomes], sum(not ok for _, ok in outcomes), wall
+
+
+def coordinates(count, offset=0):
+    # a ~5 km grid, far enough apart that no lookup is served from a neighbour's cache entry
+    return [(-60 + ((i + offset) // 500) * 0.05, -170 + ((i + offset) % 500) * 0.05) for i in range(count)]
+
+
+def scenarios(args):
+    """ (name, concurrency, runner) for every scenario, runners return (latencies, failures, wall, items) """
+    n = args.requests
+
+    def current_cold(concurrency):
+        items = coordinates(n)
+        return run_calls(lambda c: weather_api.get_current_data(lat=c[0], lon=c[1]), items, concurrency) + (n,)
+
+    def current_cached(concurrency):
+        items = coordinates(20) * (n // 20)
+        run_calls(lambda c: weather_api.get_current_data(lat=c[0], lon=c[1]), items[:20], concurrency)
+        return run_calls(lambda c: weather_api.get_current_data(lat=c[0], lon=c[1]), items, concurrency) \
+            + (len(items),)
+
+    def forecast_cold(concurrency):
+        items = coordinates(n // 4)
+        return run_calls(lambda c: weather_api.get_forecast_data(lat=c[0], lon=c[1]), items, concurrency) \
+            + (len(items),)
+
+    def forecast_columnar(concurrency):
+        items = coordinates(n // 4)
+        return run_calls(lambda c: weather_api.get_forecast_data(lat=c[0], lon=c[1], columnar=True), items,
+                         concurrency) + (len(items),)
+
+    def bulk_location(concurrency):
+        items = coordinates(n)
+        started = time.perf_counter()
+        results = weather_api.get_multiple_location(items, max_workers=concurrency)
+        wall = time.perf_counter() - started
+        # one call for the whole batch, there is no per item latency to report
+        return [], sum(not r["success"] for r in results), wall, len(items)
+
+    def bulk_city(concurrency):
+        index = weather_api._city_index()
+        # distinct names only (at most --requests), repeating them would measure cache hits
+        names = [f"{index.names[i]}, {index.countries[i]}" for i in range(len(index))] if index is not None else []
+        items = list(dict.fromkeys(names))[:n]
+        started = time.perf_counter()
+        results = weather_api.get_multiple_city(items, max_workers=concurrency)
+        wall = time.perf_counter() - started
+        return [], sum(not r["success"] for r in results), wall, len(items)
+
+    runners = [("current_cold", current_cold), ("current_cached", current_cached),
+               ("forecast_cold", forecast_cold), ("forecast_columnar", forecast_columnar),
+               ("bulk_location", bulk_location), ("bulk_city", bulk_city)]
+    for name, runner in runners:
+        for concurrency in args.concurrency:
+            yield name, concurrency, runner
+
+
+def parser_scenarios(number):
+    """ Parser throughput on the recorded payloads, single threaded """
+    with open(os.path.join(root, "samples", "current.json"), encoding="utf-8") as f:
+        current = json.load(f)
+    with open(os.path.join(root, "samples", "forecast.json"), encoding="utf-8") as f:
+        forecast = json.load(f)
+
+    for name, func, payload in [("parse_current", weather_api._filter_current_data, current),
+                                ("parse_forecast", weather_api.filter_forecast_data, forecast),
+                                ("parse_forecast_columns", weather_api.filter_forecast_columns, forecast)]:
+        # the first call pays for lazy imports (pandas), keep it out of the numbers
+        func(payload)
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(number):
+            t = time.perf_counter()
+            func(payload)
+            latencies.append(time.perf_counter() - t)
+        yield name, 1, (latencies, 0, time.perf_counter() - started, number)
+
+
+def summary(name, concurrency, measured):
+    latencies, failures, wall, items = measured
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "items": items,
+        "failures": failures,
+        "p50_ms": None if not latencies else round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": None if not latencies else round(percentile(latencies, 99) * 1000, 3),
+        "per_sec": round(items / wall, 1) if wall else None,
+        "wall_s": round(wall, 3),
+        "cumulative_peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def _ms(value):
+    return f"{'-':>9}" if value is None else f"{value:9.3f}"
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, path):
+    """ Print the change of p50/p99/throughput against a previous --json file """
+    with open(path, encoding="utf-8") as f:
+        previous = {(r["scenario"], r["concurrency"]): r for r in json.load(f)["results"]}
+
+    print(f"\nchange vs {path} (positive = slower / fewer per second):")
+    for result in results:
+        before = previous.get((result["scenario"], result["concurrency"]))
+        if before is None:
+            continue
+        changes = []
+        for field in ("p50_ms", "p99_ms", "per_sec"):
+            if before.get(field) and result.get(field):
+                if field == "per_sec":
+                    change = before[field] / result[field] - 1
+                else:
+                    change = result[field] / before[field] - 1
+                changes.append(f"{field} {change:+.1%}")
+        print(f"{result['scenario']:<24} c={result['concurrency']:<4} " + "  ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400, help="lookups per scenario")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma separated thread counts")
+    parser.add_argument("--latency", type=float, default=20, help="stub server latency in ms")
+    parser.add_argument("--jitter", type=float, default=10, help="stub server jitter in ms")
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of 503 answers")
+    parser.add_argument("--throttle-rate", type=float, default=0, help="fraction of 429 answers")
+    parser.add_argument("--parse-number", type=int, default=2000, help="parses per parser scenario")
+    parser.add_argument("--base-url", help="use a running server instead of starting the stub")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="previous --json file to compare against")
+    args = parser.parse_args()
+    args.concurrency = [int(c) for c in args.concurrency.split(",")]
+
+    server = None
+    if args.base_url is None:
+        server = StubServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                            throttle_rate=args.throttle_rate, retry_after=0, seed=1).start()
+    base_url = args.base_url or server.base_url
+    weather_api.set_session(weather_api.WeatherSession(base_url, pool_size=max(16, max(args.concurrency))))
+
+    results = []
+    try:
+        runs = list(scenarios(args)) + [(name, c, lambda _, m=measured: m)
+                                        for name, c, measured in parser_scenarios(args.parse_number)]
+        for name, concurrency, runner in runs:
+            reset_caches()
+            result = summary(name, concurrency, runner(concurrency))
+            results.append(result)
+            print(f"{name:<24} c={concurrency:<4} p50 {_ms(result['p50_ms'])} ms  p99 {_ms(result['p99_ms'])} ms  "
+                  f"{result['per_sec']:10.1f}/s  failures {result['failures']:<4} "
+                  f"peak rss so far {result['cumulative_peak_rss_mb']} MB")
+    finally:
+        if server is not None:
+            server.stop()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"commit": git_commit(), "python": sys.version.split()[0], "base_url": base_url,
+                       "config": {"requests": args.requests, "latency_ms": args.latency, "jitter_ms": args.jitter,
+                                  "error_rate": args.error_rate, "throttle_rate": args.throttle_rate},
+                       "results": results}, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+""" Micro-benchmark of the response parsers on the recorded payloads in samples/.
+
+Compares the original per-item parsers (kept below as _legacy_*) with the current
+weather_api implementations and prints the time per parsed response, then times decoding +
+parsing from the raw response bytes with every JSON library installed (see weather_json).
+
+    python benchmarks/bench_parse.py [--number 2000] [--json results.json]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timezone, timedelta
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import weather_api
+import weather_json
+from weather_api import weather_icons
+
+
+def _legacy_filter_current_data(data):
+    tz = timezone(timedelta(seconds=data.get("timezone", 0)))
+
+    def to_local_time(timestamp):
+        if timestamp is None:
+            return None
+        try:
+            return datetime.fromtimestamp(timestamp, tz=timezone.utc).astimezone(tz).strftime("%Y-%m-%d %I:%M %p")
+        except Exception:
+            return None
+
+    id = str(data.get("weather", [{}])[0].get("icon", "-"))
+
+    def get_weather_icon(i):
+        return weather_icons.get(i, {}).get("emoji", "☁️")
+
+    main = data.get("main", {})
+    sys_data = data.get("sys", {})
+
+    return {
+        "city": data.get("name", "-"),
+        "date_time": to_local_time(data.get("dt")),
+        "temperature": main.get("temp"),
+        "feels_like": main.get("feels_like"),
+        "weather_description": data.get("weather", [{}])[0].get("description", "-"),
+        "weather_icon": get_weather_icon(id),
+        "pressure": main.get("pressure"),
+        "humidity": main.get("humidity"),
+        "visibility": data.get("visibility"),
+        "wind_speed": data.get("wind", {}).get("speed"),
+        "sunrise": to_local_time(sys_data.get("sunrise")),
+        "sunset": to_local_time(sys_data.get("sunset")),
+        "long": data.get("coord", {}).get("lon"),
+        "lat": data.get("coord", {}).get("lat"),
+        "timezone": data.get("timezone", 0),
+        "country": sys_data.get("country", "-"),
+    }
+
+
+def _legacy_filter_forecast_data(data):
+    tz = timezone(timedelta(seconds=data.get("city", {}).get("timezone", 0)))
+
+    def to_local_time(timestamp):
+        if timestamp is None:
+            return None
+        try:
+            return datetime.fromtimestamp(timestamp, tz=timezone.utc).astimezone(tz).strftime("%Y-%m-%d %I:%M %p")
+        except Exception:
+            return None
+
+    city_info = {
+        "city": data.get("city", {}).get("name", "-"),
+        "latitude": data.get("city", {}).get("coord", {}).get("lat"),
+        "longitude": data.get("city", {}).get("coord", {}).get("lon"),
+        "country": data.get("city", {}).get("country", "-"),
+        "timezone": data.get("city", {}).get("timezone", 0)
+    }
+
+    infolist = []
+    for item in data.get("list", []):
+        main = item.get("main", {})
+        weather_list = item.get("weather", [{}])
+        id = weather_list[0].get("icon", "-")
+
+        def get_weather_icon(i):
+            return weather_icons.get(i, {}).get("emoji", "☁️")
+
+        infolist.append({"date": to_local_time(item.get("dt")),
+                         "temperature": main.get("temp"),
+                         "feels_like": main.get("feels_like"),
+                         "weather_description": weather_list[0].get("description", "-"),
+                         "weather_icon": get_weather_icon(id),
+                         "pressure": main.get("pressure"),
+                         "humidity": main.get("humidity"),
+                         "visibility": item.get("visibility"),
+                         "wind_speed": item.get("wind", {}).get("speed"),
+                         "sunrise": to_local_time(data.get("city", {}).get("sunrise", 0)),
+                         "sunset": to_local_time(data.get("city", {}).get("sunset", 0))})
+
+    return {"city": city_info, "forecast": infolist}
+
+
+def load_sample(name):
+    with open(os.path.join(root, "samples", name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_raw(name):
+    with open(os.path.join(root, "samples", name), "rb") as f:
+        return f.read()
+
+
+def per_call_us(func, payload, number):
+    best = min(timeit.repeat(lambda: func(payload), number=number, repeat=5))
+    return best / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000, help="parses per timing run")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    current = load_sample("current.json")
+    forecast = load_sample("forecast.json")
+
+    # the rework must not change the output
+    assert _legacy_filter_current_data(current) == weather_api._filter_current_data(current)
+    assert _legacy_filter_forecast_data(forecast) == weather_api.filter_forecast_data(forecast)
+
+    cases = [
+        ("current", "legacy", _legacy_filter_current_data, current),
+        ("current", "current", weather_api._filter_current_data, current),
+        ("forecast", "legacy", _legacy_filter_forecast_data, forecast),
+        ("forecast", "current", weather_api.filter_forecast_data, forecast),
+        ("forecast", "frame", weather_api.filter_forecast_columns, forecast),
+        ("forecast", "arrays", lambda d: weather_api.filter_forecast_columns(d, as_frame=False), forecast),
+    ]
+
+    results = []
+    for payload, variant, func, data in cases:
+        us = per_call_us(func, data, args.number)
+        results.append({"payload": payload, "variant": variant, "us_per_response": round(us, 2)})
+        print(f"{payload:<9} {variant:<9} {us:10.1f} us/response")
+
+    print("\ndecode + parse from the raw bytes:")
+    raw = [("current", "weather", weather_api._filter_current_data, current, load_raw("current.json")),
+           ("forecast", "forecast", weather_api.filter_forecast_data, forecast, load_raw("forecast.json"))]
+    for name in weather_json.backends:
+        try:
+            weather_json.use(name)
+        except ImportError:
+            continue
+        for payload, kind, parse, data, body in raw:
+            # selective decoding must not change the parsed result
+            assert parse(weather_json.decode(body, kind)) == parse(data)
+            us = per_call_us(lambda b, k=kind, p=parse: p(weather_json.decode(b, k)), body, args.number)
+            results.append({"payload": payload, "variant": f"decode:{name}", "us_per_response": round(us, 2)})
+            print(f"{payload:<9} {name:<9} {us:10.1f} us/response")
+    weather_json.use()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
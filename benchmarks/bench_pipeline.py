@@ -0,0 +1,104 @@
+""" Offline scaling benchmark of weather_pipeline on the recorded forecast payload in samples/.
+
+Every location "fetches" samples/forecast.json (after an optional simulated network delay), so only
+the pipeline itself is measured: the thread-only bulk path as the baseline, then the pipeline with
+0 (parsing in the calling process) up to --processes parser processes, with the speedup and the
+per process efficiency relative to one parser process.
+
+    python benchmarks/bench_pipeline.py [--locations 20000] [--processes 1,2,4,8] [--latency 5] [--json results.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import weather_api
+import weather_json
+from weather_pipeline import iter_forecasts
+
+
+def recorded_fetch(latency):
+    """ fetch(location) returning the recorded forecast bytes after latency ms, like a request would """
+    with open(os.path.join(root, "samples", "forecast.json"), "rb") as f:
+        body = f.read()
+
+    def fetch(location):
+        if latency:
+            time.sleep(latency / 1000)
+        return body
+
+    return fetch
+
+
+def locations(count):
+    # distinct coordinates, so nothing is served from a cache entry
+    return [(-60 + (i // 500) * 0.05, -170 + (i % 500) * 0.05) for i in range(count)]
+
+
+def run_threads(items, fetch, io_workers):
+    """ Baseline: fetch, decode and parse on the I/O threads (the get_multiple_* way) """
+    def worker(location):
+        data = weather_json.decode(fetch(location), "forecast")
+        return {"success": True, "data": weather_api.filter_forecast_data(data), "error": None}
+
+    return sum(result["success"] for _, result in weather_api._bulk_fetch(worker, items, io_workers))
+
+
+def run_pipeline(items, fetch, io_workers, processes, chunk_size):
+    return sum(result["success"] for _, result in iter_forecasts(items, io_workers, processes, chunk_size,
+                                                                  cache=False, fetch=fetch))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--locations", type=int, default=20000, help="forecasts per run")
+    parser.add_argument("--processes", help="comma separated parser process counts (default: 1, 2, 4 ... CPUs)")
+    parser.add_argument("--io-workers", type=int, default=32, help="concurrent fetches")
+    parser.add_argument("--latency", type=float, default=5, help="simulated network latency per fetch in ms")
+    parser.add_argument("--chunk-size", type=int, default=16, help="responses per parser chunk")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    if args.processes:
+        processes = [int(p) for p in args.processes.split(",")]
+    else:
+        processes = sorted({1, cpus} | {2 ** i for i in range(1, cpus.bit_length()) if 2 ** i < cpus})
+
+    items = locations(args.locations)
+    fetch = recorded_fetch(args.latency)
+    print(f"{args.locations} forecasts, {cpus} CPUs, JSON: {weather_json.backend()}, latency {args.latency:g} ms")
+
+    runs = [("threads", None)] + [("pipeline", 0)] + [("pipeline", p) for p in processes]
+    results = []
+    for name, count in runs:
+        started = time.perf_counter()
+        if name == "threads":
+            parsed = run_threads(items, fetch, args.io_workers)
+        else:
+            parsed = run_pipeline(items, fetch, args.io_workers, count, args.chunk_size)
+        wall = time.perf_counter() - started
+        results.append({"mode": name, "processes": count, "parsed": parsed, "wall_s": round(wall, 3),
+                        "per_sec": round(len(items) / wall, 1)})
+
+    single = next((r["per_sec"] for r in results if r["processes"] == 1), None)
+    for result in results:
+        if single and result["processes"]:
+            result["speedup"] = round(result["per_sec"] / single, 2)
+            result["efficiency"] = round(result["speedup"] / result["processes"], 2)
+        label = result["mode"] if result["processes"] is None else f"{result['mode']} x{result['processes']}"
+        print(f"{label:<14} {result['per_sec']:10.1f}/s  wall {result['wall_s']:8.3f} s  "
+              f"speedup {result.get('speedup', '-')}  efficiency {result.get('efficiency', '-')}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"cpus": cpus, "json": weather_json.backend(), "config": vars(args), "results": results}, f,
+                      indent=2)
+
+
+if __name__ == "__main__":
+    main()
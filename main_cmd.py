@@ -1,7 +1,14 @@
-from weather_api import *
-import pandas as pd
+import argparse
+import csv
+import json
+import os
+import sys
+import time
 
-print(r"""
+from weather_api import get_current_data, get_forecast_data, iter_multiple, parse_location
+from weather_records import CurrentObservation
+
+banner = r"""
              ,-----.  ,--.  ,--, ,------.      ,--.   .--. ,------.   ,----.  ,----------. ,--. ,--. ,------. ,-------.
             |  .-.  | |   \ |  | |  .---'      |  |   |  | |  .---'  /  __  \ '--.    .--' |  | |  | |  .---' |  .--.  |
             |  | |  | |    \|  | |  |          |  |   |  | |  |     |  .  .  |    |  |     |  |_|  | |  |     |  |__|  |
@@ -10,58 +17,218 @@ print(r"""
             |  '-'  | |  | \   | |  `---.      |   ,'.   | |  `---. |  |  |  |    |  |     |  | |  | |  `---. |  | \  \
              `-----'  `--'  `--' `------'      '--'   '--' `------' `--'  `--'    `--'     `--' `--' `------' `--'  '--'
                                                                                                 Welcome to "One Weather"
-""")
-
-
-while True:
-    input_1 = input("> Enter 'current' to see real_time_weather or 'forecast' to see 5 days forecast "
-                    "(Enter 'q' to exit) : ")
-
-    if input_1 == "current":
-        location = input("> Enter City name OR type 'coord' for latitude & longitude : ").strip()
-        if location.lower() == "coord":
-            try:
-                lon = float(input("> Enter longitude: "))
-                lat = float(input("> Enter latitude: "))
-                result = get_current_data(lon=lon, lat=lat)
-            except ValueError:
-                result = {"success": False, "error": "Error: Invalid latitude or longitude.", "data": None}
-        else:
-            result = get_current_data(city=location)
+"""
 
-        if result["success"] :
-            for key, value in result["data"].items():
-                print(f"\t\t{key}: {value}")
-        else:
-            print(result["error"])
-
-    elif input_1 == "forecast":
-        location = input("> Enter City name OR type 'coord' for latitude & longitude : ").strip()
-        if location.lower() == "coord":
-            try:
-                lon = float(input("> Enter longitude: "))
-                lat = float(input("> Enter latitude: "))
-                result = get_forecast_data(lon=lon, lat=lat)
-            except ValueError:
-                result = {"success": False, "error": "Error: Invalid latitude or longitude.", "data": None}
-        else:
-            result = get_forecast_data(city=location)
+# columns of the batch output: input line number and text, outcome, then the current weather fields
+batch_columns = ["line", "query", "success", "error", "stale"] + list(CurrentObservation._fields)
+
+# exit codes of the batch mode
+exit_ok = 0
+exit_failed_rows = 1
+exit_usage = 2
+
+
+def interactive():
+    print(banner)
+
+    while True:
+        input_1 = input("> Enter 'current' to see real_time_weather or 'forecast' to see 5 days forecast "
+                        "(Enter 'q' to exit) : ")
+
+        if input_1 == "current":
+            location = input("> Enter City name OR type 'coord' for latitude & longitude : ").strip()
+            if location.lower() == "coord":
+                try:
+                    lon = float(input("> Enter longitude: "))
+                    lat = float(input("> Enter latitude: "))
+                    result = get_current_data(lon=lon, lat=lat)
+                except ValueError:
+                    result = {"success": False, "error": "Error: Invalid latitude or longitude.", "data": None}
+            else:
+                result = get_current_data(city=location)
+
+            if result["success"] :
+                for key, value in result["data"].items():
+                    print(f"\t\t{key}: {value}")
+            else:
+                print(result["error"])
 
-        if result["success"]:
-            print(result["data"]["city"])
+        elif input_1 == "forecast":
+            location = input("> Enter City name OR type 'coord' for latitude & longitude : ").strip()
+            if location.lower() == "coord":
+                try:
+                    lon = float(input("> Enter longitude: "))
+                    lat = float(input("> Enter latitude: "))
+                    result = get_forecast_data(lon=lon, lat=lat, columnar=True)
+                except ValueError:
+                    result = {"success": False, "error": "Error: Invalid latitude or longitude.", "data": None}
+            else:
+                result = get_forecast_data(city=location, columnar=True)
 
-            pd.set_option("display.max_columns", None)
-            df = pd.DataFrame(result["data"]["forecast"])
-            print(df)
+            if result["success"]:
+                print(result["data"]["city"])
+
+                # only the forecast view needs pandas, keep it out of the startup path
+                import pandas as pd
+
+                pd.set_option("display.max_columns", None)
+                print(result["data"]["forecast"])
+
+            else:
+                print(result["error"])
+
+        elif input_1 == "q":
+            break
 
         else:
-            print(result["error"])
+            print("Enter valid response. Try again")
+
+
+def batch(args):
+    """ Fetch current weather for every location in args.input and stream one row per location to args.output.
+    Returns:
+        exit code: 0 when every row succeeded, 1 when some rows failed, 2 on unusable input/output
+    """
+    fmt = args.format or _format_for(args.output)
+    if fmt == "parquet" and args.output == "-":
+        print("Error: Parquet output needs a file name", file=sys.stderr)
+        return exit_usage
+
+    try:
+        source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return exit_usage
+
+    # input line of every location in flight, only the bulk window is ever held here
+    pending = {}
+
+    def locations():
+        position = 0
+        for line_number, line in enumerate(source, 1):
+            text = line.strip()
+            if not text or text.startswith("#"):
+                continue
+            pending[position] = (line_number, text)
+            position += 1
+            yield parse_location(text)
+
+    done = failed = 0
+    started = last_report = time.monotonic()
+    try:
+        with _RowWriter(args.output, fmt) as write:
+            for position, result in iter_multiple(locations(), args.workers):
+                line_number, text = pending.pop(position)
+                write(_batch_row(line_number, text, result))
+
+                done += 1
+                failed += not result["success"]
+                if args.progress and time.monotonic() - last_report >= 1:
+                    last_report = time.monotonic()
+                    _report(done, failed, started)
+
+    except (OSError, ImportError) as e:
+        print(f"\nError: {e}", file=sys.stderr)
+        return exit_usage
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+    if args.progress:
+        _report(done, failed, started)
+        print(file=sys.stderr)
+    return exit_failed_rows if failed else exit_ok
+
+
+def _batch_row(line_number, text, result):
+    row = {"line": line_number, "query": text, "success": result["success"], "error": result["error"],
+           "stale": result.get("stale", False)}
+    row.update(result["data"] or dict.fromkeys(CurrentObservation._fields))
+    return row
+
+
+def _report(done, failed, started):
+    rate = done / max(time.monotonic() - started, 1e-9)
+    print(f"\r{done} done, {failed} failed, {rate:.1f}/s", end="", file=sys.stderr, flush=True)
+
+
+def _format_for(path):
+    extension = os.path.splitext(path)[1].lower()
+    return {".csv": "csv", ".parquet": "parquet", ".pq": "parquet"}.get(extension, "jsonl")
+
+
+class _RowWriter:
+    """ Context manager returning a write(row) function that streams rows to path in the given format """
+
+    def __init__(self, path, fmt, row_group=1000):
+        self.path = path
+        self.fmt = fmt
+        self.row_group = row_group
+        self._file = None
+        self._parquet = None
+        self._rows = []
+
+    def __enter__(self):
+        if self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            types = {str: pa.string(), float: pa.float64(), int: pa.int64(), bool: pa.bool_()}
+            fields = [("line", pa.int64()), ("query", pa.string()), ("success", pa.bool_()),
+                      ("error", pa.string()), ("stale", pa.bool_())]
+            fields += [(name, types[kind]) for name, kind in CurrentObservation.__annotations__.items()]
+            self._schema = pa.schema(fields)
+            self._table = pa.Table.from_pylist
+            self._parquet = pq.ParquetWriter(self.path, self._schema)
+            return self._write_parquet
+
+        self._file = sys.stdout if self.path == "-" else open(self.path, "w", encoding="utf-8", newline="")
+        if self.fmt == "csv":
+            writer = csv.DictWriter(self._file, fieldnames=batch_columns, extrasaction="ignore")
+            writer.writeheader()
+            return writer.writerow
+        return lambda row: self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def _write_parquet(self, row):
+        # rows are buffered into row groups, a Parquet file can't be appended one row at a time
+        self._rows.append(row)
+        if len(self._rows) >= self.row_group:
+            self._flush()
+
+    def _flush(self):
+        if self._rows:
+            self._parquet.write_table(self._table(self._rows, schema=self._schema))
+            self._rows = []
+
+    def __exit__(self, *exc):
+        if self._parquet is not None:
+            self._flush()
+            self._parquet.close()
+        elif self._file is not None and self._file is not sys.stdout:
+            self._file.close()
+        elif self._file is not None:
+            self._file.flush()
 
-    elif input_1 == "q":
-        break
 
-    else:
-        print("Enter valid response. Try again")
+def main():
+    parser = argparse.ArgumentParser(
+        description="One Weather. Without arguments an interactive prompt, with --input a batch lookup of "
+                    "current weather for many locations.",
+        epilog="Batch exit codes: 0 all rows succeeded, 1 some rows failed (see the error column), "
+               "2 unusable input or output.")
+    parser.add_argument("--input", "-i", help="file with one city name or 'lat, lon' per line, '-' for stdin")
+    parser.add_argument("--output", "-o", default="-", help="output file, '-' for stdout (default)")
+    parser.add_argument("--format", "-f", choices=["jsonl", "csv", "parquet"],
+                        help="output format (default: from the output file extension, else jsonl)")
+    parser.add_argument("--workers", "-w", type=int, default=None, help="concurrent requests (default: bulk_workers)")
+    parser.add_argument("--quiet", "-q", dest="progress", action="store_false", help="no progress on stderr")
+    args = parser.parse_args()
 
+    if args.input is None:
+        interactive()
+        return exit_ok
+    return batch(args)
 
 
+if __name__ == "__main__":
+    sys.exit(main())
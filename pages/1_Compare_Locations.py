@@ -0,0 +1,146 @@
+import io
+import time
+
+import pandas as pd
+import streamlit as st
+
+from weather_api import iter_multiple_city, iter_multiple_location, parse_location
+
+
+# ******************  Helper functions  *************************
+def parse_locations(text):
+    """ One location per line: a city name or "lat, lon" """
+    cities, coordinates = [], []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        location = parse_location(line)
+        if isinstance(location, tuple):
+            coordinates.append(location)
+        else:
+            cities.append(location)
+    return cities, coordinates
+
+
+def parse_csv(uploaded):
+    """ A CSV with a "city" column and/or "lat" and "lon" columns """
+    df = pd.read_csv(io.BytesIO(uploaded.getvalue()))
+    df.columns = [str(col).strip().lower() for col in df.columns]
+
+    cities = df["city"].dropna().astype(str).str.strip().tolist() if "city" in df else []
+    coordinates = []
+    if "lat" in df and "lon" in df:
+        coords = df[["lat", "lon"]].apply(pd.to_numeric, errors="coerce").dropna()
+        coordinates = list(coords.itertuples(index=False, name=None))
+    return cities, coordinates
+
+
+def to_row(label, result):
+    data = result["data"] or {}
+    return {
+        "location": label,
+        "city": data.get("city"),
+        "country": data.get("country"),
+        "temperature": data.get("temperature"),
+        "feels_like": data.get("feels_like"),
+        "humidity": data.get("humidity"),
+        "pressure": data.get("pressure"),
+        "wind_speed": data.get("wind_speed"),
+        "weather": f'{data.get("weather_icon", "")} {data.get("weather_description", "")}'.strip() or None,
+        "lat": data.get("lat", result.get("lat")),
+        "lon": data.get("long", result.get("lon")),
+        "error": result["error"],
+    }
+
+
+def fetch_all(cities, coordinates, on_progress):
+    """ Fetch through the bulk API, calling on_progress(rows, done, total) as results stream in """
+    total = len(cities) + len(coordinates)
+    rows = []
+
+    streams = [(iter_multiple_city(cities), lambda i: cities[i]),
+               (iter_multiple_location(coordinates), lambda i: f"{coordinates[i][0]}, {coordinates[i][1]}")]
+
+    last_update = 0.0
+    for stream, label in streams:
+        for index, result in stream:
+            rows.append(to_row(label(index), result))
+            # redraw a few times a second, not once per result
+            if time.monotonic() - last_update > 0.5 or len(rows) == total:
+                on_progress(rows, len(rows), total)
+                last_update = time.monotonic()
+
+    return pd.DataFrame(rows, columns=list(to_row("", {"data": None, "error": None})))
+
+
+# ********************* User Handling ****************************
+
+st.set_page_config(page_title="Compare locations", page_icon="🗺️", layout="wide")
+
+st.markdown("""
+<div>
+    <h1 style="font-size:48px;">🗺️ Compare Locations </h1>
+    <p style="font-size:20px;color:#9ca3af;margin-top:-6px;">Current weather for many sites at once.</p>
+</div>
+""", unsafe_allow_html=True)
+
+if "compare_data" not in st.session_state:
+    st.session_state.compare_data = None
+
+c1, c2 = st.columns([0.6, 0.4])
+with c1:
+    text = st.text_area("Locations (one per line: city name or lat, lon)", height=160,
+                        placeholder="London\nNew Delhi\n28.6128, 77.2311")
+with c2:
+    uploaded = st.file_uploader("...or upload a CSV with a city or lat/lon columns", type="csv")
+
+if st.button("Compare"):
+    cities, coordinates = parse_csv(uploaded) if uploaded is not None else parse_locations(text)
+
+    if not cities and not coordinates:
+        st.error("No locations provided. Please enter cities or latitude & longitude values.")
+    else:
+        progress = st.progress(0.0, text="Fetching weather...")
+        live_map = st.empty()
+        live_table = st.empty()
+
+        def show_progress(rows, done, total):
+            progress.progress(done / total, text=f"Fetched {done} of {total} locations")
+            df = pd.DataFrame(rows)
+            live_map.map(df.dropna(subset=["lat", "lon"]), latitude="lat", longitude="lon")
+            live_table.dataframe(df.tail(20), hide_index=True)
+
+        st.session_state.compare_data = fetch_all(cities, coordinates, show_progress)
+        progress.empty()
+        live_map.empty()
+        live_table.empty()
+
+
+# ************************** Results *******************************************
+
+df = st.session_state.compare_data
+if df is not None:
+    failed = df["error"].notna()
+    st.markdown("""<hr style='border:1px solid #6366f1; margin: 10px 0;'>""", unsafe_allow_html=True)
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Locations", len(df))
+    m2.metric("Failed", int(failed.sum()))
+    m3.metric("Warmest", "-" if df["temperature"].isna().all() else df.loc[df["temperature"].idxmax(), "location"])
+
+    ok = df[~failed]
+    if not ok.empty:
+        st.map(ok, latitude="lat", longitude="lon")
+
+    # sort server side and send one page at a time, so render cost stays flat for long lists
+    s1, s2, s3 = st.columns([0.4, 0.3, 0.3])
+    sort_by = s1.selectbox("Sort by", ["location", "temperature", "feels_like", "humidity", "pressure",
+                                       "wind_speed", "country", "error"])
+    descending = s2.toggle("Descending")
+    page_size = s3.selectbox("Rows per page", [25, 50, 100], index=1)
+
+    ordered = df.sort_values(sort_by, ascending=not descending, na_position="last")
+    pages = max(1, -(-len(ordered) // page_size))
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+
+    st.dataframe(ordered.iloc[(page - 1) * page_size: page * page_size], hide_index=True)
+    st.download_button("Download CSV", df.to_csv(index=False), file_name="weather_comparison.csv")
@@ -0,0 +1,81 @@
+import os
+from datetime import date, datetime, time, timedelta, timezone
+
+import streamlit as st
+
+import weather_api
+from weather_analytics import accuracy_report, variables
+from weather_history import HistoryStore, default_path
+
+
+# ******************  Helper functions  *************************
+@st.cache_data(ttl=300, show_spinner=False)
+def load_report(path, start, end, locations):
+    """ Accuracy tables of the history store at path, recomputed at most every 5 minutes """
+    report = accuracy_report(HistoryStore(path), start, end, list(locations) or None)
+    return report["by_lead"], report["overall"], report["pairs"], report["locations"]
+
+
+def day_start(day):
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+# ********************* User Handling ****************************
+
+st.set_page_config(page_title="Forecast accuracy", page_icon="🎯", layout="wide")
+
+st.markdown("""
+<div>
+    <h1 style="font-size:48px;">🎯 Forecast Accuracy </h1>
+    <p style="font-size:20px;color:#9ca3af;margin-top:-6px;">How far the 5 day forecast was from what was observed.</p>
+</div>
+""", unsafe_allow_html=True)
+
+path = st.text_input("History store", value=weather_api.history.path if weather_api.history is not None
+                     else os.getenv("weather_history_path", default_path))
+store = HistoryStore(path)
+known = store.locations("forecast")
+
+if not known:
+    st.info("No forecasts recorded yet. Set `weather_history_path` (or call `weather_api.enable_history()`) "
+            "and keep fetching forecasts and current weather for the same places, e.g. with the scheduler.")
+    st.stop()
+
+c1, c2 = st.columns([0.4, 0.6])
+with c1:
+    window = st.date_input("Forecasts issued between", value=(date.today() - timedelta(days=7), date.today()))
+with c2:
+    chosen = st.multiselect("Locations (all when empty)", known)
+
+if not isinstance(window, (tuple, list)) or len(window) != 2:
+    st.stop()
+
+with st.spinner("Matching forecasts with observations..."):
+    by_lead, overall, pairs, matched = load_report(path, day_start(window[0]), day_start(window[1] + timedelta(days=1)),
+                                                   tuple(chosen))
+
+st.markdown("""<hr style='border:1px solid #6366f1; margin: 10px 0;'>""", unsafe_allow_html=True)
+m1, m2 = st.columns(2)
+m1.metric("Matched forecast slots", f"{pairs:,}")
+m2.metric("Locations", matched)
+
+if by_lead.empty:
+    st.warning("No forecast slot has an observation within 90 minutes of its time yet.")
+    st.stop()
+
+st.subheader("Overall")
+st.dataframe(overall.round(3), hide_index=True)
+
+variable = st.selectbox("Variable", list(variables))
+rows = by_lead[by_lead["variable"] == variable].set_index("lead_hours")
+
+g1, g2 = st.columns(2)
+with g1:
+    st.write("***Mean absolute error by lead time (hours)***")
+    st.line_chart(rows[["mae", "rmse"]])
+with g2:
+    st.write("***Bias (forecast - observed) by lead time (hours)***")
+    st.bar_chart(rows[["bias"]])
+
+st.dataframe(by_lead.round(3), hide_index=True)
+st.download_button("Download CSV", by_lead.to_csv(index=False), file_name="forecast_accuracy.csv")
@@ -0,0 +1,234 @@
+""" Local stand-in for the OpenWeather API, for offline tests and load benchmarks.
+
+Serves /weather, /forecast and /group from recorded payloads (samples/ by default) with
+configurable latency, jitter, server errors and 429s. Point the clients at it through base_url:
+
+    python stub_server.py --port 8765 --latency 50 --jitter 20 --error-rate 0.01 --throttle-rate 0.01
+    weather_api_url=http://127.0.0.1:8765 streamlit run weather_gui_1.py
+
+With --record URL unknown requests are forwarded to a real API root once, saved next to the
+samples and replayed from then on.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+default_samples = os.path.join(os.path.dirname(os.path.abspath(__file__)), "samples")
+
+# recorded payload served for each endpoint when no exact recording matches
+default_payloads = {"weather": "current.json", "forecast": "forecast.json"}
+
+
+class StubServer:
+    """ Threaded HTTP server replaying recorded OpenWeather payloads.
+    Args:
+        port (int): port to listen on, 0 picks a free one
+        latency (float): added delay per request in ms
+        jitter (float): random extra delay of up to this many ms
+        error_rate (float): fraction of requests answered with 503
+        throttle_rate (float): fraction of requests answered with 429 (with a Retry-After header)
+        retry_after (float): Retry-After seconds sent with 429s
+        samples (str): directory with current.json / forecast.json and recordings
+        record_from (str): real API root to forward (and record) requests without a recording to
+        seed (int): seed of the random latency/error draws, for repeatable runs
+    Unknown city names ("q" containing "invalid" or "unknown") get a 404 like the real API.
+    """
+
+    def __init__(self, port=0, latency=0, jitter=0, error_rate=0, throttle_rate=0, retry_after=1,
+                 samples=None, record_from=None, seed=None, host="127.0.0.1"):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.samples = samples or default_samples
+        self.record_from = record_from.rstrip("/") if record_from else None
+        self.requests = 0
+        self.statuses = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._payloads = {endpoint: _load(os.path.join(self.samples, name))
+                          for endpoint, name in default_payloads.items()}
+        self._server = ThreadingHTTPServer((host, port), _handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "statuses": dict(self.statuses)}
+
+    def respond(self, endpoint, params):
+        """ (status, headers, body bytes) for one request, after the configured delay """
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            draw = self._random.random()
+
+        if delay:
+            time.sleep(delay / 1000)
+
+        if draw < self.throttle_rate:
+            status, headers, body = 429, {"Retry-After": f"{self.retry_after:g}"}, \
+                {"cod": 429, "message": "Your account is temporary blocked due to exceeding of requests limitation"}
+        elif draw < self.throttle_rate + self.error_rate:
+            status, headers, body = 503, {}, {"cod": 503, "message": "Service Unavailable"}
+        else:
+            status, body = self._payload(endpoint, params)
+            headers = {}
+
+        with self._lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+        return status, headers, json.dumps(body, separators=(",", ":")).encode()
+
+    def _payload(self, endpoint, params):
+        recorded = self._recording(endpoint, params)
+        if recorded is not None:
+            return 200, recorded
+
+        query = params.get("q", "").casefold()
+        if "invalid" in query or "unknown" in query:
+            return 404, {"cod": "404", "message": "city not found"}
+
+        if endpoint == "group":
+            ids = [int(i) for i in params.get("id", "").split(",") if i.strip().isdigit()]
+            items = [_group_item(_located(self._payloads["weather"], {"id": str(i)})) for i in ids]
+            return 200, {"cnt": len(items), "list": items}
+
+        if endpoint not in self._payloads:
+            return 404, {"cod": "404", "message": "Internal error"}
+        return 200, _located(self._payloads[endpoint], params, forecast=endpoint == "forecast")
+
+    def _recording(self, endpoint, params):
+        path = os.path.join(self.samples, "recorded", _recording_name(endpoint, params))
+        if os.path.exists(path):
+            return _load(path)
+        if self.record_from is None:
+            return None
+
+        import requests
+
+        response = requests.get(f"{self.record_from}/{endpoint}", params=params, timeout=30)
+        if response.status_code != 200:
+            return None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(response.text)
+        return response.json()
+
+
+def _handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # headers and body go out as separate writes, without TCP_NODELAY the client's delayed ACK adds ~40 ms
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            endpoint = url.path.rstrip("/").rsplit("/", 1)[-1]
+            status, headers, body = server.respond(endpoint, dict(parse_qsl(url.query)))
+
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def _located(payload, params, forecast=False):
+    """ Copy of a recorded payload moved to the requested location, so results differ per location """
+    # only the top level (and the forecast's city) is replaced, the shared slots are never modified
+    payload = dict(payload)
+    if forecast:
+        payload["city"] = place = dict(payload["city"])
+    else:
+        place = payload
+    if "lat" in params and "lon" in params:
+        try:
+            place["coord"] = {"lat": float(params["lat"]), "lon": float(params["lon"])}
+        except ValueError:
+            pass
+    if "q" in params:
+        place["name"] = params["q"].split(",")[0].strip().title()
+    if "id" in params and params["id"].isdigit():
+        place["id"] = int(params["id"])
+    return payload
+
+
+def _group_item(payload):
+    """ /group items carry the UTC offset in sys.timezone instead of a top level timezone """
+    payload["sys"] = dict(payload.get("sys", {}), timezone=payload.pop("timezone", 0))
+    for key in ("base", "cod"):
+        payload.pop(key, None)
+    return payload
+
+
+def _recording_name(endpoint, params):
+    # the api key is not part of the recording
+    query = urlencode(sorted((k, v) for k, v in params.items() if k != "appid"))
+    return f"{endpoint}-{hashlib.sha1(query.encode()).hexdigest()[:16]}.json"
+
+
+def _load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenWeather stand-in serving recorded payloads.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--latency", type=float, default=0, help="added delay per request in ms")
+    parser.add_argument("--jitter", type=float, default=0, help="random extra delay of up to this many ms")
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of requests answered with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--samples", help="directory with the recorded payloads (default: samples/)")
+    parser.add_argument("--record", metavar="URL", help="forward unknown requests to this API root and record them")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    server = StubServer(args.port, args.latency, args.jitter, args.error_rate, args.throttle_rate, args.retry_after,
+                        args.samples, args.record, args.seed, args.host).start()
+    print(f"Serving on {server.base_url}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+""" Forecast-vs-actual accuracy of the /forecast slots, computed over the history store.
+
+Every stored forecast slot is matched with the observation of the same location closest to its
+valid time (a vectorized as-of join), then errors are aggregated per lead time and variable.
+Everything runs on whole columns with NumPy/pandas, so millions of slots take seconds.
+"""
+import numpy as np
+import pandas as pd
+
+# variables compared between forecast slots and observations
+variables = ("temperature", "humidity", "pressure", "wind_speed")
+
+# an observation further than this from a slot's valid time doesn't count as its actual
+default_tolerance = pd.Timedelta(minutes=90)
+
+# forecast slots are 3 hours apart, lead times are reported in buckets of this size
+lead_bucket_hours = 3
+
+
+def align(forecasts, observations, tolerance=None, variables=variables):
+    """ Pair each forecast slot with the nearest observation of its location.
+    Args:
+        forecasts (DataFrame): location, issued_at, valid_at and the variables (HistoryStore.query("forecast"))
+        observations (DataFrame): location, observed_at and the variables (HistoryStore.query("current"))
+        tolerance (Timedelta): largest gap between valid_at and observed_at, defaults to 90 minutes
+    Returns:
+        DataFrame: location, issued_at, valid_at, observed_at, lead_hours and <variable>_forecast /
+                   <variable>_observed columns, one row per slot with a matching observation
+    """
+    tolerance = default_tolerance if tolerance is None else pd.Timedelta(tolerance)
+    columns = list(variables)
+
+    slots = forecasts[["location", "issued_at", "valid_at"] + columns]
+    # slots that were already in the past when the forecast was fetched are not forecasts
+    slots = slots[slots["valid_at"] > slots["issued_at"]]
+    actuals = observations[["location", "observed_at"] + columns].dropna(subset=["observed_at"])
+
+    # merge_asof needs both sides sorted on the join key, "by" keeps the match within one location
+    aligned = pd.merge_asof(slots.sort_values("valid_at", kind="stable"),
+                            actuals.sort_values("observed_at", kind="stable"),
+                            left_on="valid_at", right_on="observed_at", by="location", direction="nearest",
+                            tolerance=tolerance, suffixes=("_forecast", "_observed"))
+    aligned = aligned.dropna(subset=["observed_at"])
+
+    # lead times are rounded up to the slot spacing: 0-3 h ahead is the 3 h bucket
+    lead = (aligned["valid_at"] - aligned["issued_at"]) / pd.Timedelta(hours=1)
+    aligned["lead_hours"] = (np.ceil(lead / lead_bucket_hours) * lead_bucket_hours).astype("int64")
+    return aligned.reset_index(drop=True)
+
+
+def accuracy(aligned, variables=variables):
+    """ MAE and bias (forecast - observed) per lead time and variable.
+    Returns:
+        DataFrame: variable, lead_hours, mae, bias, rmse, pairs (long format, sorted by variable and lead)
+    """
+    lead = aligned["lead_hours"].to_numpy()
+    leads, position = np.unique(lead, return_inverse=True)
+
+    frames = []
+    for variable in variables:
+        error = aligned[f"{variable}_forecast"].to_numpy(dtype="float64") - \
+            aligned[f"{variable}_observed"].to_numpy(dtype="float64")
+        valid = ~np.isnan(error)
+        groups, error = position[valid], error[valid]
+
+        # one bincount per statistic instead of a Python loop over groups
+        pairs = np.bincount(groups, minlength=len(leads))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            frames.append(pd.DataFrame({
+                "variable": variable,
+                "lead_hours": leads,
+                "mae": np.bincount(groups, np.abs(error), minlength=len(leads)) / pairs,
+                "bias": np.bincount(groups, error, minlength=len(leads)) / pairs,
+                "rmse": np.sqrt(np.bincount(groups, error * error, minlength=len(leads)) / pairs),
+                "pairs": pairs,
+            }))
+
+    if not frames:
+        return pd.DataFrame(columns=["variable", "lead_hours", "mae", "bias", "rmse", "pairs"])
+    report = pd.concat(frames, ignore_index=True)
+    return report[report["pairs"] > 0].reset_index(drop=True)
+
+
+def accuracy_report(store=None, start=None, end=None, locations=None, tolerance=None):
+    """ Accuracy of everything in the history store issued in [start, end).
+    Args:
+        store (HistoryStore): defaults to the one enabled in weather_api (or the default path)
+        start, end (datetime or epoch seconds): window on the forecast issue time
+        locations (list): location ids (see weather_history.location_id), all by default
+        tolerance (Timedelta): see align
+    Returns:
+        dict: {"by_lead": accuracy() table, "overall": per variable totals, "pairs": matched slots,
+               "locations": locations with matches}
+    """
+    import weather_api
+    from weather_history import HistoryStore
+
+    store = store or weather_api.history or HistoryStore()
+    columns = list(variables)
+    forecasts = store.query("forecast", locations, start, end, columns=["valid_at"] + columns)
+
+    # observations can come up to 5 days after the last issue time
+    observed_end = None if end is None else _timestamp(end) + pd.Timedelta(days=5, hours=3)
+    observations = store.query("current", locations, start, observed_end, columns=columns)
+
+    aligned = align(forecasts, observations, tolerance)
+    by_lead = accuracy(aligned)
+
+    weights = by_lead["pairs"]
+    overall = by_lead.assign(abs_total=by_lead["mae"] * weights, total=by_lead["bias"] * weights) \
+        .groupby("variable", sort=False)[["abs_total", "total", "pairs"]].sum()
+    overall = pd.DataFrame({"mae": overall["abs_total"] / overall["pairs"],
+                            "bias": overall["total"] / overall["pairs"],
+                            "pairs": overall["pairs"]}).reset_index()
+
+    return {"by_lead": by_lead, "overall": overall, "pairs": len(aligned),
+            "locations": int(aligned["location"].nunique())}
+
+
+def _timestamp(moment):
+    if isinstance(moment, (int, float)):
+        return pd.Timestamp(moment, unit="s", tz="UTC")
+    moment = pd.Timestamp(moment)
+    return moment if moment.tzinfo is not None else moment.tz_localize("UTC")
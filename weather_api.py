@@ -1,7 +1,19 @@
-import requests
 import os
+import sys
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timezone, timedelta
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+from functools import lru_cache, partial
+
+import weather_json
+import weather_metrics as metrics
+from weather_breaker import CircuitBreaker
+
+# requests, NumPy and pandas are imported where they are needed, so importing this module
+# (and serving cached results) stays cheap for short-lived processes
 
 weather_icons = {
     "01d": {"description": "clear sky", "emoji": "☀️"},
@@ -24,49 +36,861 @@ weather_icons = {
     "50n": {"description": "mist", "emoji": "🌫️"}
 }
 
+# flat icon code -> emoji table used by the parsers
+weather_emoji = {code: icon["emoji"] for code, icon in weather_icons.items()}
+default_emoji = "☁️"
+
+# format of every date/time string in parsed results
+time_format = "%Y-%m-%d %I:%M %p"
+
 try:
     api_key = os.getenv("weather_api")
 except KeyError:
     raise RuntimeError("Can't find api key")
 
-base_url = "https://api.openweathermap.org/data/2.5"
+# can be overridden to point every process at a local stub server
+default_base_url = os.getenv("weather_api_url", "https://api.openweathermap.org/data/2.5")
+
+# default number of concurrent requests used by the bulk helpers
+bulk_workers = 8
+
+# how long parsed results stay fresh: current conditions update ~every 10 minutes, forecast slots every 3 hours
+current_ttl = 10 * 60
+forecast_ttl = 3 * 60 * 60
+
+# coordinates are rounded to this many decimals (~1 km) when building cache keys
+coord_precision = 2
+
+# a coordinate lookup without its own cache entry reuses a cached result within this many km (0 disables)
+snap_radius_km = 2.0
+
+# /group accepts at most this many city IDs per request
+group_size = 20
+
+# resolve city names to IDs with the local city index and batch them through /group
+use_group_endpoint = True
+
+# look city names up in the local city index first: known names are fetched by ID and cached by
+# coordinates, and when the index is a complete city list unknown names fail without an API call
+geocode_cities = True
+
+# upstream statuses worth retrying: transient server errors (429s are handled by _request)
+retry_statuses = (500, 502, 503, 504)
+
+# longest a caller queues for rate limit budget (or a 429's Retry-After) before it gets stale data or an error
+rate_limit_wait = 10
+
+# wait assumed for a 429 without a Retry-After header, the free plan quota is counted per minute
+default_retry_after = 60
+
+# expired results are kept this much longer as a fallback while the API key is rate limited or the API is down
+stale_ttl = 24 * 60 * 60
+
+# consecutive failed requests (timeouts, connection errors, 5xx) after which requests fail fast,
+# and how long until a probe request checks whether the API is back
+breaker_failures = 5
+breaker_reset = 30
+
+# an expired result up to this many seconds past its ttl is returned at once (flagged stale) while a
+# background refresh fetches a new one, 0 always waits for the fresh result
+revalidate_window = 10 * 60
+
+
+class WeatherSession:
+    """ Pooled, keep-alive HTTP transport shared by every weather_api request.
+    Args:
+        base_url (str): API root, defaults to default_base_url. Point it at a stub server for tests.
+        pool_size (int): connections kept alive per host, should be >= the number of bulk workers
+        retries (int): retry attempts on 5xx responses and failed connections
+        backoff (float): exponential backoff factor in seconds between retries
+        timeout (float): per request timeout in seconds
+        session (requests.Session): optional pre-configured session to wrap
+    """
+
+    def __init__(self, base_url=None, pool_size=16, retries=3, backoff=0.5, timeout=10, session=None):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.base_url = (base_url or default_base_url).rstrip("/")
+        self.timeout = timeout
+        self.session = session if session is not None else requests.Session()
+
+        # read timeouts are not retried, a slow upstream would otherwise block callers for retries * timeout.
+        # Retry-After is left to _request, urllib3 would sleep for it (and retry 429s) inside the pool.
+        retry = Retry(total=retries, connect=retries, read=0, status=retries, backoff_factor=backoff,
+                      status_forcelist=retry_statuses, allowed_methods=frozenset(["GET"]),
+                      respect_retry_after_header=False, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, endpoint, params):
+        """ GET base_url/endpoint and return the requests.Response """
+        return self.session.get(f"{self.base_url}/{endpoint}", params=params, timeout=self.timeout)
+
+    def close(self):
+        self.session.close()
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """ Return the shared WeatherSession, creating the default one on first use """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = WeatherSession()
+    return _session
+
+
+def set_session(session):
+    """ Replace the shared transport used by all weather_api calls.
+    Args:
+        session (WeatherSession): any object with a get(endpoint, params) method returning a requests.Response
+    Returns:
+        the previous session (or None)
+    """
+    global _session
+    with _session_lock:
+        previous, _session = _session, session
+    return previous
+
+
+class RateLimited(Exception):
+    """ The request was refused by the client-side rate limiter or answered with 429 Too Many Requests """
+
+    def __init__(self, message, response=None):
+        super().__init__(message)
+        self.response = response
+
+
+class CircuitOpen(Exception):
+    """ The request was not sent because the circuit breaker is open after repeated upstream failures """
+
+
+# optional client-side limiter applied to every request (see enable_rate_limit)
+rate_limiter = None
+
+# shared by every request of the process, see CircuitBreaker
+breaker = CircuitBreaker(breaker_failures, breaker_reset)
+
+# 429 responses received from the API
+rate_limited_responses = 0
+
+
+def enable_rate_limit(requests_per_minute=60, requests_per_day=None, path=None, burst=None):
+    """ Keep this process (or every process sharing path) within the quota of the API key.
+    Args:
+        requests_per_minute (int): sustained request rate allowed for the key
+        requests_per_day (int): optional daily quota
+        path (str): SQLite file shared by all processes using the key, in-process only when None
+        burst (int): requests allowed back to back, defaults to 1/6 of the per minute rate
+    Returns:
+        the RateLimiter in use
+    """
+    global rate_limiter
+    from weather_ratelimit import RateLimiter
+
+    rate_limiter = RateLimiter(requests_per_minute, requests_per_day, path, burst)
+    return rate_limiter
+
+
+def disable_rate_limit():
+    global rate_limiter
+    rate_limiter = None
+
+
+def quota_stats():
+    """ Requests counted against the key this minute/day (when a limiter is enabled) and 429s received """
+    stats = rate_limiter.stats() if rate_limiter is not None else {}
+    stats["rate_limited_responses"] = rate_limited_responses
+    return stats
+
+
+def _request(endpoint, params):
+    """ GET endpoint through the shared session, within the budget of the rate limiter.
+    Callers queue for up to rate_limit_wait seconds. A 429 blocks the limiter for its Retry-After and is
+    retried when that still fits into the wait, otherwise RateLimited is raised.
+    While the circuit breaker is open CircuitOpen is raised without sending anything.
+    """
+    global rate_limited_responses
+    deadline = time.monotonic() + rate_limit_wait
+    while True:
+        if not breaker.allow():
+            metrics.inc("weather_errors_total", endpoint=endpoint, error="CircuitOpen")
+            raise CircuitOpen("Weather service unavailable")
+
+        limiter = rate_limiter
+        if limiter is not None and not limiter.acquire(max(0.0, deadline - time.monotonic())):
+            breaker.release()
+            raise RateLimited("Request budget of the API key exhausted")
+
+        try:
+            response = _timed_get(endpoint, params)
+        except BaseException:
+            breaker.record_failure()
+            raise
+        # a 4xx (even a 429) still means the API is up
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+        if response.status_code != 429:
+            return response
+
+        rate_limited_responses += 1
+        metrics.inc("weather_retries_total", endpoint=endpoint)
+        retry_after = _retry_after(response)
+        if limiter is not None:
+            limiter.block_for(retry_after)
+        if time.monotonic() + retry_after > deadline:
+            raise RateLimited(f"Rate limited by the API for {retry_after:.0f}s", response=response)
+        if limiter is None:
+            time.sleep(retry_after)
+
+
+def _timed_get(endpoint, params):
+    """ One GET through the shared session, timed and counted by weather_metrics when it is enabled """
+    if not metrics.enabled:
+        return get_session().get(endpoint, params)
+
+    started = time.perf_counter()
+    try:
+        response = get_session().get(endpoint, params)
+    except Exception as e:
+        metrics.inc("weather_errors_total", endpoint=endpoint, error=type(e).__name__)
+        raise
+    metrics.observe("weather_request_seconds", time.perf_counter() - started, endpoint=endpoint)
+    metrics.inc("weather_responses_total", endpoint=endpoint, status=response.status_code)
+
+    # retries urllib3 did inside this call (5xx answers, dropped connections)
+    retries = getattr(getattr(response.raw, "retries", None), "history", None)
+    if retries:
+        metrics.inc("weather_retries_total", len(retries), endpoint=endpoint)
+    return response
+
+
+def _json(response, kind=None):
+    """ Decoded body of a response, straight from its bytes with the fastest JSON library installed.
+    kind is the endpoint ("weather", "forecast", "group"), see weather_json.decode.
+    """
+    with metrics.span("json_decode"):
+        try:
+            return weather_json.decode(response.content, kind)
+        except Exception:
+            # let requests raise its own error type (a RequestException) for a malformed body
+            return response.json()
+
+
+def _retry_after(response):
+    """ Seconds to wait after a 429, from its Retry-After header """
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", "")))
+    except ValueError:
+        return default_retry_after
+
+
+if os.getenv("weather_rate_limit"):
+    enable_rate_limit(int(os.getenv("weather_rate_limit")),
+                      int(os.getenv("weather_daily_quota")) if os.getenv("weather_daily_quota") else None,
+                      os.getenv("weather_rate_limit_path"))
+
+
+class ResponseCache:
+    """ Thread-safe TTL + LRU cache for parsed API results, shared by every caller in the process.
+    Args:
+        max_entries (int): maximum number of cached results
+        max_bytes (int): approximate memory bound for all cached results
+        max_stale (float): how long expired entries stay available to get_stale
+    Cached values are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, max_entries=2048, max_bytes=64 * 1024 * 1024, max_stale=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_stale = stale_ttl if max_stale is None else max_stale
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nearby_hits = 0
+        self._entries = OrderedDict()  # key -> (expires_at, size, value, stored_at)
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        """ True when key has a live entry, without touching the counters or LRU order """
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def get(self, key, nearby=False):
+        """ Return the cached value for key, or None when missing or expired.
+        nearby marks a lookup standing in for a nearby coordinate, its hits are also counted as nearby_hits.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            now = time.monotonic()
+            if entry is None or entry[0] <= now:
+                # expired entries are kept for get_stale until max_stale runs out (or LRU evicts them)
+                if entry is not None and entry[0] + self.max_stale <= now:
+                    self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if nearby:
+                self.nearby_hits += 1
+            return entry[2]
+
+    def get_stale(self, key):
+        """ Return (value, age in seconds) for key even when expired, or None when missing or too old """
+        with self._lock:
+            entry = self._entries.get(key)
+            now = time.monotonic()
+            if entry is None or entry[0] + self.max_stale <= now:
+                return None
+            return entry[2], now - entry[3]
+
+    def set(self, key, value, ttl, age=0):
+        """ Store value under key for ttl seconds, evicting least recently used entries when over budget.
+        age is how long ago the value was fetched (e.g. when promoted from the disk cache), stale ages count from then.
+        """
+        size = _approx_size(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            now = time.monotonic()
+            self._entries[key] = (now + ttl, size, value, now - age)
+            self.bytes += size
+
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """ Return hit/miss/eviction counters and current size as a dictionary """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "nearby_hits": self.nearby_hits, "entries": len(self._entries), "bytes": self.bytes}
+
+    def _remove(self, key):
+        self.bytes -= self._entries.pop(key)[1]
+
+
+def _approx_size(value):
+    """ Rough deep size in bytes of the dicts/lists/scalars that make up a parsed result """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_approx_size(k) + _approx_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_approx_size(v) for v in value)
+    return size
+
+
+def cache_key(endpoint, params):
+    """ Build a normalized cache key from the endpoint and request params.
+    City names are case/whitespace insensitive and coordinates are rounded to coord_precision.
+    """
+    units = params.get("units", "metric")
+    if "q" in params:
+        return endpoint, "city", " ".join(str(params["q"]).split()).casefold(), units
+
+    return endpoint, "coord", _round_coord(params["lat"]), _round_coord(params["lon"]), units
+
+
+def _round_coord(value):
+    try:
+        return round(float(value), coord_precision)
+    except (TypeError, ValueError):
+        # not a number (e.g. raw text input), keep it as is and let the API reject it
+        return str(value)
+
+
+response_cache = ResponseCache()
+
+
+# optional second level cache on disk, shared between processes (see enable_disk_cache)
+disk_cache = None
+
+
+def enable_disk_cache(path=None, max_bytes=256 * 1024 * 1024):
+    """ Persist parsed results in a SQLite file so fresh processes start with a warm cache.
+    Args:
+        path (str): database file, defaults to ~/.cache/one_weather/cache.sqlite3
+        max_bytes (int): size cap of the stored results
+    Returns:
+        the DiskCache in use
+    """
+    global disk_cache
+    from weather_disk_cache import DiskCache
+
+    disk_cache = DiskCache(path, max_bytes=max_bytes)
+    return disk_cache
+
+
+def disable_disk_cache():
+    global disk_cache
+    if disk_cache is not None:
+        disk_cache.close()
+    disk_cache = None
+
+
+def cache_stats():
+    """ Hit/miss/eviction counters of the shared response cache (and the disk cache when enabled) """
+    stats = response_cache.stats()
+    stats["coalesced"] = coalesced_calls()
+    if disk_cache is not None:
+        stats["disk"] = disk_cache.stats()
+    return stats
+
+
+def _cache_get(key):
+    """ Look key up in memory, then on disk (promoting disk hits into memory), then around it on the grid """
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+
+    if disk_cache is not None:
+        try:
+            found = disk_cache.lookup(key)
+        except Exception:
+            # a locked or corrupt cache file must never break a lookup
+            found = None
+        if found is not None:
+            value, ttl, age = found
+            value = _from_disk(key, value)
+            response_cache.set(key, value, ttl, age)
+            _remember_location(key)
+            return value
+
+    return _cache_get_nearby(key)
+
+
+def _cache_set(key, value, ttl):
+    """ Store a freshly fetched result, every new result passes through here """
+    response_cache.set(key, value, ttl)
+    _remember_location(key)
+    if disk_cache is not None:
+        try:
+            disk_cache.set(key, _to_disk(key, value), ttl)
+        except Exception:
+            pass
+    _notify(key, value)
+
+
+# non-numeric columns of a columnar forecast, everything but these and "date" is float64
+_text_columns = ("weather_description", "weather_icon")
+
+
+def _to_disk(key, value):
+    """ JSON friendly form of a result: columnar forecasts are stored as lists (date as epoch seconds) """
+    if key[-1] != "columns" or not value["success"]:
+        return value
+
+    import pandas as pd
+
+    frame = value["data"]["forecast"]
+    forecast = {"date": ((frame["date"] - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)).tolist()}
+    for name, column in frame.items():
+        if name != "date":
+            # NaN is not valid JSON
+            forecast[name] = column.tolist() if name in _text_columns else column.astype(object).where(
+                column.notna(), None).tolist()
+    return dict(value, data={"city": value["data"]["city"], "forecast": forecast})
+
+
+def _from_disk(key, value):
+    """ Inverse of _to_disk """
+    if key[-1] != "columns" or not value["success"]:
+        return value
+
+    import numpy as np
+    import pandas as pd
+
+    city = value["data"]["city"]
+    columns = {}
+    for name, values in value["data"]["forecast"].items():
+        if name == "date":
+            dates = np.array(values, dtype="int64")
+            columns[name] = pd.to_datetime(dates, unit="s", utc=True).tz_convert(_tz_for_offset(city["timezone"]))
+        else:
+            columns[name] = np.array(values, dtype=object if name in _text_columns else "float64")
+    return dict(value, data={"city": city, "forecast": pd.DataFrame(columns)})
+
+
+# callables run as listener(endpoint, cache key, result) for every freshly fetched result
+result_listeners = []
+
+
+def add_result_listener(listener):
+    """ Call listener(endpoint, key, result) for every new result. Listeners run on the request path
+    (they must not block or mutate the result) and their exceptions are ignored.
+    """
+    if listener not in result_listeners:
+        result_listeners.append(listener)
+
+
+def remove_result_listener(listener):
+    if listener in result_listeners:
+        result_listeners.remove(listener)
+
+
+def _notify(key, value):
+    for listener in list(result_listeners):
+        try:
+            listener(key[0], key, value)
+        except Exception:
+            pass
+
+
+# optional store of every fetched result (see enable_history)
+history = None
+
+
+def enable_history(path=None):
+    """ Record every fetched observation and forecast in a local time-series store.
+    Args:
+        path (str): store directory, defaults to ~/.cache/one_weather/history
+    Returns:
+        the HistoryStore in use (query it for trends, see weather_history)
+    """
+    global history
+    from weather_history import HistoryStore
+
+    disable_history()
+    history = HistoryStore(path)
+    add_result_listener(history.record)
+    return history
+
+
+def disable_history():
+    global history
+    if history is not None:
+        remove_result_listener(history.record)
+        history.close()
+    history = None
+
+
+# one grid per endpoint/units/format, holding the coordinate keys currently in the memory cache
+_grids = {}
+_grids_lock = threading.Lock()
+
+
+def _grid_for(key):
+    """ The GridIndex for a coordinate cache key, or None for city keys or when snapping is off """
+    if not snap_radius_km or key[1] != "coord" or not isinstance(key[2], float):
+        return None
+
+    signature = (key[0],) + key[4:]
+    grid = _grids.get(signature)
+    if grid is None:
+        from weather_spatial import GridIndex
+
+        with _grids_lock:
+            grid = _grids.setdefault(signature, GridIndex(cell_km=snap_radius_km))
+    return grid
+
+
+def _remember_location(key):
+    grid = _grid_for(key)
+    if grid is None:
+        return
+
+    grid.add(key[2], key[3], key)
+    # evicted keys are dropped lazily, prune once the grid clearly outgrows the cache
+    if len(grid) > 2 * response_cache.max_entries:
+        grid.prune(lambda k: k in response_cache)
+
+
+def _cache_get_nearby(key):
+    """ Cached result of the nearest coordinate lookup within snap_radius_km, or None """
+    grid = _grid_for(key)
+    if grid is None:
+        return None
+
+    found = grid.nearest(key[2], key[3], snap_radius_km, accept=lambda k: k in response_cache)
+    if found is None:
+        return None
+
+    return response_cache.get(found[0], nearby=True)
+
+
+if os.getenv("weather_cache_path"):
+    enable_disk_cache(os.getenv("weather_cache_path"))
+
+if os.getenv("weather_history_path"):
+    enable_history(os.getenv("weather_history_path"))
+
+
+class SingleFlight:
+    """ Collapse concurrent identical calls from different threads into one.
+    The first caller for a key runs the function, everyone arriving while it is in flight
+    waits for it and gets the same result (or exception).
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class AsyncSingleFlight:
+    """ asyncio counterpart of SingleFlight: concurrent awaits of the same key share one task """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._tasks = {}
+
+    async def do(self, key, coro_fn):
+        import asyncio
+
+        # tasks belong to one event loop, so keys are scoped per loop
+        loop_key = (id(asyncio.get_running_loop()), key)
+        task = self._tasks.get(loop_key)
+        if task is None:
+            task = asyncio.ensure_future(coro_fn())
+            self._tasks[loop_key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(loop_key, None))
+        else:
+            self.coalesced += 1
 
+        # shield so one cancelled waiter doesn't cancel the request for everyone else
+        return await asyncio.shield(task)
 
-def get_current_data(city=None, lat=None, lon=None):
+
+inflight = SingleFlight()
+async_inflight = AsyncSingleFlight()
+
+
+def coalesced_calls():
+    """ Number of lookups that were served by joining an identical in-flight request """
+    return inflight.coalesced + async_inflight.coalesced
+
+
+def get_current_data(city=None, lat=None, lon=None, refresh=False):
     """ get current weather location of any location or city
     Args:
         1)city (str) : City name or
         2)lat (int): latitude
         3)lon (int) longitude
+        refresh (bool): skip the cache lookup and fetch a fresh result (which is then cached)
     **Either provide city name or lat and lon
     Returns:
         A python dictionary
     """
 
+    params = _current_params(city, lat, lon)
+    if params is None:
+        return _no_location()
+
+    params, key = _resolve_location("weather", params)
+    if key is None:
+        return _unknown_city()
+
+    cached = None if refresh else _cache_get(key)
+    if cached is not None:
+        return cached
+
+    fetch = partial(_fetch_current, key, params)
+    stale = None if refresh or not revalidate_window else _revalidate(key, fetch)
+    if stale is not None:
+        return stale
+
+    return inflight.do(key, fetch)
+
+
+def _current_params(city, lat, lon):
+    """ query params for /weather, or None when no location was given """
     if city is not None:
-        params = {"q": city, "appid": api_key, "units": "metric"}
+        return {"q": city, "appid": api_key, "units": "metric"}
     elif lat is not None and lon is not None:
-        params = {"lat": lat, "lon": lon, "appid": api_key, "units": "metric"}
-    else:
-        # print("Either provide a city name or latitude & longitude values.")
-        return {"success": False, "error": "No location provided. Please enter a city or latitude & longitude.",
-                "data": None}
+        return {"lat": lat, "lon": lon, "appid": api_key, "units": "metric"}
+    return None
+
+
+def _forecast_params(city, lat, lon):
+    """ query params for /forecast, or None when no location was given """
+    if city:
+        return {"q": city, "appid": api_key, "units": "metric"}
+    elif lat is not None and lon is not None:
+        return {"lat": lat, "lon": lon, "appid": api_key, "units": "metric"}
+    return None
+
+
+def _resolve_location(endpoint, params):
+    """ Geocode city queries with the local city index before anything goes over the network.
+    Known cities are requested by ID and cached by their (rounded) coordinates, so a city name and a
+    lat/lon lookup of the same place share one cache entry.
+    Returns:
+        (params, cache key), the key is None for names an authoritative index doesn't know
+    """
+    if "q" in params and geocode_cities:
+        index = _city_index()
+        if index is not None:
+            place = index.geocode(params["q"])
+            if place is not None:
+                key = cache_key(endpoint, {"lat": place.lat, "lon": place.lon, "units": params["units"]})
+                return {"id": place.id, "appid": params["appid"], "units": params["units"]}, key
+
+            if index.rejects(params["q"]):
+                return params, None
+
+    return params, cache_key(endpoint, params)
+
+
+def _unknown_city():
+    return {"success": False, "error": "Error: Invalid city name or coordinates", "data": None}
+
+
+def _rate_limited(key):
+    """ The last result for key flagged as stale (with its age), or an error when nothing was cached """
+    return _stale_or(key, "Error: Too many requests, API rate limit reached. Try again later.")
+
+
+def _unavailable(key):
+    """ Same as _rate_limited while the API is down (circuit breaker open, timeouts, 5xx) """
+    return _stale_or(key, "Error: Weather service unavailable, Try again later.")
+
+
+def _stale_or(key, error):
+    found = response_cache.get_stale(key)
+    if found is not None:
+        value, age = found
+        metrics.inc("weather_stale_total", reason="fallback")
+        return dict(value, stale=True, age=round(age))
+    return {"success": False, "error": error, "data": None}
+
+
+def _revalidate(key, fetch):
+    """ Serve an expired result for key at once and refresh it in the background.
+    Returns:
+        the stale result (flagged stale, with its age), or None when the caller should wait for fetch:
+        nothing is cached, or the entry is more than revalidate_window past its ttl while the API is up
+    """
+    found = response_cache.get_stale(key)
+    if found is None:
+        return None
+
+    value, age = found
+    ttl = forecast_ttl if key[0] == "forecast" else current_ttl
+    if age > ttl + revalidate_window and not breaker.is_open:
+        return None
+
+    # while the breaker is open the refresh fails fast (or becomes the half-open probe)
+    _refresh_in_background(key, fetch)
+    metrics.inc("weather_stale_total", reason="revalidate")
+    return dict(value, stale=True, age=round(age))
+
+
+_refresh_pool = None
+_refreshing = set()
+_refresh_lock = threading.Lock()
+
+
+def _refresh_in_background(key, fetch):
+    """ Run fetch for key on the refresh pool, once per key at a time """
+    global _refresh_pool
+    with _refresh_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+        if _refresh_pool is None:
+            _refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="weather-refresh")
+
+    def run():
+        try:
+            inflight.do(key, fetch)
+        finally:
+            with _refresh_lock:
+                _refreshing.discard(key)
+
+    _refresh_pool.submit(run)
+
+
+def _no_location():
+    return {"success": False, "error": "No location provided. Please enter a city or latitude & longitude.",
+            "data": None}
+
+
+def _fetch_current(key, params):
+    import requests
 
     try:
-        response = requests.get(f"{base_url}/weather", params=params, timeout=10)
+        response = _request("weather", params)
         response.raise_for_status()
-        return {"success": True, "data": _filter_current_data(response.json()), "error": None}
+        data = _json(response, "weather")
+        with metrics.span("parse_current"):
+            result = {"success": True, "data": _filter_current_data(data), "error": None}
+        _cache_set(key, result, current_ttl)
+        return result
+
+    except RateLimited:
+        return _rate_limited(key)
+
+    except CircuitOpen:
+        return _unavailable(key)
 
     except requests.exceptions.Timeout:
-        return {"success": False, "error": "Error: Request timed out, Try again later.", "data": None}
+        return _stale_or(key, "Error: Request timed out, Try again later.")
 
     except requests.exceptions.ConnectionError:
-        return {"success": False, "error": "Error: Network problem, Check your internet connection", "data": None}
+        return _stale_or(key, "Error: Network problem, Check your internet connection")
 
-    except requests.exceptions.HTTPError:
+    except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code >= 500:
+            return _unavailable(key)
         return {"success": False, "error": "Error: Invalid city name or coordinates", "data": None}
 
     except Exception as e:
+        metrics.inc("weather_errors_total", endpoint="weather", error=type(e).__name__)
         return {"success": False, "error": f"Unexpected error: {e}", "data": None}
 
 
@@ -79,118 +903,400 @@ def _filter_current_data(data):
         dict: dictionary with cleaned and safe weather information
     """
 
-    tz = timezone(timedelta(seconds=data.get("timezone", 0)))
-    def to_local_time(timestamp):
-        if timestamp is None:
-            return None
-        try:
-            return datetime.fromtimestamp(timestamp, tz=timezone.utc).astimezone(tz).strftime("%Y-%m-%d %I:%M %p")
-        except Exception:
-            return None
-
-    id = str(data.get("weather", [{}])[0].get("icon", "-"))
-
-    def get_weather_icon(i):
-        return weather_icons.get(i, {}).get("emoji", "☁️")
-
+    offset = data.get("timezone", 0)
+    tz = _tz_for_offset(offset)
+    weather = (data.get("weather") or [{}])[0]
     main = data.get("main", {})
     sys_data = data.get("sys", {})
+    coord = data.get("coord", {})
 
     mydict = {
         "city": data.get("name", "-"),
-        "date_time": to_local_time(data.get("dt")),
+        "date_time": _local_time(data.get("dt"), tz),
         "temperature": main.get("temp"),
         "feels_like": main.get("feels_like"),
-        "weather_description": data.get("weather", [{}])[0].get("description", "-"),
-        "weather_icon": get_weather_icon(id),
-        # "weather_id_icon": data.get("weather",[{}])[0].get("icon", "-"),
+        "weather_description": weather.get("description", "-"),
+        "weather_icon": weather_emoji.get(str(weather.get("icon", "-")), default_emoji),
         "pressure": main.get("pressure"),
         "humidity": main.get("humidity"),
         "visibility": data.get("visibility"),
         "wind_speed": data.get("wind", {}).get("speed"),
-        "sunrise": to_local_time(sys_data.get("sunrise")),
-        "sunset": to_local_time(sys_data.get("sunset")),
-        "long": data.get("coord", {}).get("lon"),
-        "lat": data.get("coord", {}).get("lat"),
-        "timezone": data.get("timezone", 0),
+        "sunrise": _local_time(sys_data.get("sunrise"), tz),
+        "sunset": _local_time(sys_data.get("sunset"), tz),
+        "long": coord.get("lon"),
+        "lat": coord.get("lat"),
+        "timezone": offset,
         "country": sys_data.get("country", "-"),
     }
 
     return mydict
 
 
-def get_multiple_city(cities):
+@lru_cache(maxsize=256)
+def _tz_for_offset(offset):
+    """ Shared timezone object per UTC offset (in seconds), there are only a few dozen in use """
+    return timezone(timedelta(seconds=offset))
+
+
+def _local_time(timestamp, tz):
+    """ Format a unix timestamp as local time in tz, None when missing or invalid """
+    if timestamp is None:
+        return None
+    try:
+        return datetime.fromtimestamp(timestamp, tz).strftime(time_format)
+    except Exception:
+        return None
+
+
+def get_multiple_city(cities, max_workers=None):
     """ Fetch weather data for multiple cities.
     Args:
         cities (list of str): List of city names.
+        max_workers (int): Number of concurrent requests (defaults to bulk_workers).
     Returns:
-        list of dict: Each dict contains processed weather info."""
+        list of dict: Each dict contains processed weather info, in the same order as cities."""
 
-    results = []
-    for city in cities:
-        res = get_current_data(city=city)
-
-        results.append({
-            "city": city,
-            "success": res["success"],
-            "data": res["data"],
-            "error": res["error"]})
-
-    return results
+    return _collect(iter_multiple_city(cities, max_workers))
 
 
-def get_multiple_location(coordinates):
+def get_multiple_location(coordinates, max_workers=None, snap_km=None):
     """
     Fetch weather data for multiple coordinates.
     Args:
         coordinates (list of tuples): List of (lat, lon) tuples.
+        max_workers (int): Number of concurrent requests (defaults to bulk_workers).
+        snap_km (float): optional grid cell size, see iter_multiple_location
+    Returns:
+        list of dict: Each dict contains processed weather info, in the same order as coordinates.
+    """
+
+    return _collect(iter_multiple_location(coordinates, max_workers, snap_km))
+
+
+def iter_multiple_city(cities, max_workers=None):
+    """ Streaming version of get_multiple_city.
+    Names the local city index resolves to an ID are fetched group_size at a time through /group,
+    everything else with one /weather call per city.
+    Args:
+        cities (iterable of str): City names.
+        max_workers (int): Number of concurrent requests (defaults to bulk_workers).
+    Yields:
+        tuple: (index, result) as soon as each city completes, where index is the
+               position of the city in the input and result has the get_multiple_city shape.
+    """
+
+    yield from iter_multiple(cities, max_workers)
+
+
+def iter_multiple_location(coordinates, max_workers=None, snap_km=None):
+    """ Streaming version of get_multiple_location.
+    Args:
+        coordinates (iterable of tuples): (lat, lon) tuples.
+        max_workers (int): Number of concurrent requests (defaults to bulk_workers).
+        snap_km (float): snap every coordinate onto a grid of this cell size before fetching, so dense
+                         batches (e.g. GPS pings) collapse onto one request per cell
+    Yields:
+        tuple: (index, result) as soon as each location completes.
+    """
+
+    if not snap_km:
+        return _bulk_fetch(_location_result, coordinates, max_workers)
+
+    from weather_spatial import GridIndex
+
+    grid = GridIndex(cell_km=snap_km)
+    return _bulk_fetch(lambda coordinate: _location_result(coordinate, grid.snap(*coordinate)),
+                       coordinates, max_workers)
+
+
+def parse_location(line):
+    """ One line of a locations list (CLI input, watch-list, Compare page): "lat, lon" -> (lat, lon) tuple,
+    anything else is a city name
+    """
+    try:
+        lat, lon = (float(part) for part in line.split(","))
+        return lat, lon
+    except ValueError:
+        return line.strip()
+
+
+def iter_multiple(locations, max_workers=None):
+    """ Streaming bulk lookup of a mix of city names and (lat, lon) tuples, e.g. read from a file.
+    Args:
+        locations (iterable): City names and/or (lat, lon) tuples.
+        max_workers (int): Number of concurrent requests (defaults to bulk_workers).
+    Yields:
+        tuple: (index, result) as soon as each location completes. Results have the
+               iter_multiple_city shape for names and the iter_multiple_location shape for coordinates.
+    """
+
+    for _, pairs in _bulk_fetch(_city_batch, _plan_city_batches(locations), max_workers):
+        yield from pairs
+
+
+def _city_result(city):
+    res = get_current_data(city=city)
+
+    return {
+        "city": city,
+        "success": res["success"],
+        "data": res["data"],
+        "error": res["error"],
+        **_stale_fields(res)}
+
+
+def _stale_fields(res):
+    """ The stale flag and age of a stale result, to carry over into the bulk result shapes """
+    return {"stale": True, "age": res.get("age")} if res.get("stale") else {}
+
+
+def _plan_city_batches(cities):
+    """ Split cities into ("one", (position, city)) lookups and ("group", [(position, city, id, key), ...]) batches.
+    (lat, lon) tuples become ("coord", (position, coordinate)) lookups.
+    """
+    group = []
+
+    for position, city in enumerate(cities):
+        if isinstance(city, (tuple, list)):
+            yield "coord", (position, city)
+            continue
+
+        params = _current_params(city, None, None)
+        if params is not None:
+            params, key = _resolve_location("weather", params)
+
+        # cities that are unknown locally, invalid or already cached go through get_current_data
+        if not use_group_endpoint or params is None or key is None or "id" not in params or key in response_cache:
+            yield "one", (position, city)
+            continue
+
+        group.append((position, city, params["id"], key))
+        if len(group) == group_size:
+            yield "group", group
+            group = []
+
+    if group:
+        yield "group", group
+
+
+def _city_batch(batch):
+    kind, entries = batch
+    if kind == "one":
+        position, city = entries
+        return [(position, _city_result(city))]
+    if kind == "coord":
+        position, coordinate = entries
+        return [(position, _location_result(coordinate))]
+
+    try:
+        found = _fetch_group([city_id for _, _, city_id, _ in entries])
+    except RateLimited:
+        # per city retries would only hit the limit again
+        return [(position, {"city": city, **_rate_limited(key)}) for position, city, _, key in entries]
+    except Exception:
+        found = {}
+
+    pairs = []
+    for position, city, city_id, key in entries:
+        data = found.get(city_id)
+        if data is None:
+            # missing from the group response (or the group call failed), fall back to a q= lookup
+            pairs.append((position, _city_result(city)))
+            continue
+
+        result = {"success": True, "data": data, "error": None}
+        _cache_set(key, result, current_ttl)
+        pairs.append((position, {"city": city, "success": True, "data": data, "error": None}))
+
+    return pairs
+
+
+def _fetch_group(city_ids):
+    """ One /group request, returns {city id: parsed current data} for the IDs the API knows """
+    params = {"id": ",".join(str(city_id) for city_id in city_ids), "appid": api_key, "units": "metric"}
+    response = _request("group", params)
+    response.raise_for_status()
+    data = _json(response, "group")
+    with metrics.span("parse_group"):
+        return {item.get("id"): _filter_current_data(_group_item(item)) for item in data.get("list", [])}
+
+
+def _group_item(item):
+    """ /group items hold the UTC offset in sys.timezone, move it to the top level where /weather has it """
+    if "timezone" not in item and isinstance(item.get("sys"), dict) and "timezone" in item["sys"]:
+        item["timezone"] = item["sys"]["timezone"]
+    return item
+
+
+def get_group_data(city_ids, max_workers=None):
+    """ Fetch current weather for OpenWeather city IDs, group_size IDs per request.
+    Args:
+        city_ids (list of int): OpenWeather city IDs
+        max_workers (int): Number of concurrent requests (defaults to bulk_workers).
     Returns:
-        list of dict: Each dict contains processed weather info.
+        list of dict: {id, success, data, error} per ID, in the same order as city_ids
     """
+
+    city_ids = list(city_ids)
+    chunks = [city_ids[i:i + group_size] for i in range(0, len(city_ids), group_size)]
     results = []
-    for lat, lon in coordinates:
-        res = get_current_data(lat=lat, lon=lon)
+    for chunk_results in _collect(_bulk_fetch(_group_result, chunks, max_workers)):
+        results.extend(chunk_results)
+    return results
+
 
-        results.append({
-            "lat": lat,
-            "lon": lon,
-            "success": res["success"],
-            "data": res["data"],
-            "error": res["error"]})
+def _group_result(chunk):
+    import requests
+
+    try:
+        found = _fetch_group(chunk)
+    except (RateLimited, CircuitOpen, requests.exceptions.RequestException):
+        return [{"id": city_id, "success": False, "error": "Unable to fetch weather data at the moment. "
+                 "Please try again later.", "data": None} for city_id in chunk]
+
+    return [{"id": city_id, "success": city_id in found, "data": found.get(city_id),
+             "error": None if city_id in found else "Error: Unknown city id"} for city_id in chunk]
+
+
+def _city_index():
+    from weather_cities import default_index
+    return default_index()
+
+
+def _location_result(coordinate, query=None):
+    lat, lon = coordinate
+    # query is the (snapped) coordinate actually requested, results still report the input coordinate
+    query_lat, query_lon = query or coordinate
+    res = get_current_data(lat=query_lat, lon=query_lon)
+
+    return {
+        "lat": lat,
+        "lon": lon,
+        "success": res["success"],
+        "data": res["data"],
+        "error": res["error"],
+        **_stale_fields(res)}
+
+
+def _bulk_fetch(worker, items, max_workers=None):
+    """
+    Run worker over items on a bounded thread pool and yield (index, result) pairs in completion order.
+    Only a small window of items is in flight at once, so items can be a lazy iterable of any size.
+    """
+
+    workers = max(1, int(max_workers or bulk_workers))
+    window = workers * 4
+    items = enumerate(items)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(worker, item): index for index, item in islice(items, window)}
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+
+                for index, item in islice(items, len(done)):
+                    pending[pool.submit(worker, item)] = index
+        finally:
+            # stop queued work if the caller stops consuming early
+            for future in pending:
+                future.cancel()
+
+
+def _collect(pairs):
+    results = []
+    for index, result in pairs:
+        if index >= len(results):
+            results.extend([None] * (index + 1 - len(results)))
+        results[index] = result
 
     return results
 
 
-def get_forecast_data(city=None, lat=None, lon=None):
+def get_forecast_data(city=None, lat=None, lon=None, columnar=False, refresh=False):
     """ get forecast data of any location or city
     Args:
         1)city (str) : City name  or
         2)lat (int): latitude
         3)lon (int) longitude
+        columnar (bool): return the forecast as a typed DataFrame (see filter_forecast_columns)
+                         instead of a list of dictionaries
+        refresh (bool): skip the cache lookup and fetch a fresh result (which is then cached)
     **Either provide city name or lat and lon
     Returns:
         A JSON file
     """
 
-    if city:
-        params = {"q": city, "appid": api_key, "units": "metric"}
+    params = _forecast_params(city, lat, lon)
+    if params is None:
+        return _no_location()
 
-    elif lat is not None and lon is not None:
-        # url = f"{base_url}/forecast?lat={lat}&lon={lon}&appid={api_key}&units=metric"
-        params = {"lat": lat, "lon": lon, "appid": api_key, "units": "metric"}
-    else:
-        return {"success": False, "error": "No location provided. Please enter a city or latitude & longitude.",
-                "data": None}
+    params, key = _resolve_location("forecast", params)
+    if key is None:
+        return _unknown_city()
+
+    if columnar:
+        key += ("columns",)
+    cached = None if refresh else _cache_get(key)
+    if cached is not None:
+        return cached
+
+    parse = filter_forecast_columns if columnar else filter_forecast_data
+    fetch = partial(_fetch_forecast, key, params, parse)
+    stale = None if refresh or not revalidate_window else _revalidate(key, fetch)
+    if stale is not None:
+        return stale
+
+    return inflight.do(key, fetch)
+
+
+def _fetch_forecast(key, params, parse=None):
+    import requests
 
     try:
-        response = requests.get(f"{base_url}/forecast", params=params, timeout=10)
-        response.raise_for_status()
-        return {"success": True, "data": filter_forecast_data(response.json()), "error": None}
+        response = _forecast_response(params)
+        data = _json(response, "forecast")
+        with metrics.span("parse_forecast"):
+            result = {"success": True, "data": (parse or filter_forecast_data)(data), "error": None}
+        _cache_set(key, result, forecast_ttl)
+        return result
+
+    except (RateLimited, CircuitOpen, requests.exceptions.RequestException) as e:
+        return _forecast_failed(key, e)
+
+    except Exception as e:
+        # a malformed body (decode or parse error)
+        metrics.inc("weather_errors_total", endpoint="forecast", error=type(e).__name__)
+        return {"success": False, "error": f"Unexpected error: {e}", "data": None}
+
+
+def _forecast_response(params):
+    """ The /forecast response for params, raises for anything but a 2xx """
+    response = _request("forecast", params)
+    response.raise_for_status()
+    return response
 
-    except requests.exceptions.RequestException as e:
+
+def _forecast_failed(key, error):
+    """ Result of a forecast lookup that raised error: the last good result while the API is unavailable """
+    import requests
+
+    if isinstance(error, RateLimited):
+        return _rate_limited(key)
+
+    if isinstance(error, CircuitOpen):
+        return _unavailable(key)
+
+    if isinstance(error, requests.exceptions.HTTPError):
+        if error.response is not None and error.response.status_code >= 500:
+            return _unavailable(key)
         return {"success": False, "error": "Unable to fetch weather data at the moment. Please try again later.",
                 "data": None}
 
+    return _stale_or(key, "Unable to fetch weather data at the moment. Please try again later.")
+
+
 def filter_forecast_data(data):
     """ filter forecast data and return useful information
     Args:
@@ -201,58 +1307,118 @@ def filter_forecast_data(data):
                 2) the weather list, which contains forecast data for the location
     """
 
-    tz = timezone(timedelta(seconds=data.get("city", {}).get("timezone", 0)))
-
-    def to_local_time(timestamp):
-        if timestamp is None:
-            return None
-        try:
-            return datetime.fromtimestamp(timestamp, tz=timezone.utc).astimezone(tz).strftime("%Y-%m-%d %I:%M %p")
-        except Exception:
-            return None
-
-
+    # everything that is the same for all 40 slots is resolved once per response
+    city = data.get("city", {})
+    offset = city.get("timezone", 0)
+    tz = _tz_for_offset(offset)
+    coord = city.get("coord", {})
+    sunrise = _local_time(city.get("sunrise", 0), tz)
+    sunset = _local_time(city.get("sunset", 0), tz)
+    emoji = weather_emoji.get
 
     # metadata
     city_info = {
-        "city": data.get("city", {}).get("name", "-"),
-        "latitude": data.get("city", {}).get("coord", {}).get("lat"),
-        "longitude": data.get("city", {}).get("coord", {}).get("lon"),
-        "country": data.get("city", {}).get("country", "-"),
-        "timezone": data.get("city", {}).get("timezone", 0)
+        "city": city.get("name", "-"),
+        "latitude": coord.get("lat"),
+        "longitude": coord.get("lon"),
+        "country": city.get("country", "-"),
+        "timezone": offset
     }
 
     infolist = []
-    forecast_list = data.get("list", [])
-
-    for item in forecast_list:
+    for item in data.get("list", []):
         main = item.get("main", {})
-        weather_list = item.get("weather", [{}])
+        weather = (item.get("weather") or [{}])[0]
 
-        id = weather_list[0].get("icon", "-")
+        infolist.append({"date": _local_time(item.get("dt"), tz),
+                         "temperature": main.get("temp"),
+                         "feels_like": main.get("feels_like"),
+                         "weather_description": weather.get("description", "-"),
+                         "weather_icon": emoji(weather.get("icon", "-"), default_emoji),
+                         "pressure": main.get("pressure"),
+                         "humidity": main.get("humidity"),
+                         "visibility": item.get("visibility"),
+                         "wind_speed": item.get("wind", {}).get("speed"),
+                         "sunrise": sunrise,
+                         "sunset": sunset
+                         })
 
-        def get_weather_icon(i):
-            return weather_icons.get(i, {}).get("emoji", "☁️")
-
-        mydict = {"date": to_local_time(item.get("dt")),
-                  "temperature": main.get("temp"),
-                  "feels_like": main.get("feels_like"),
-                  "weather_description": weather_list[0].get("description", "-"),
-                  "weather_icon": get_weather_icon(id),
-                  "pressure": main.get("pressure"),
-                  "humidity": main.get("humidity"),
-                  "visibility": item.get("visibility"),
-                  "wind_speed": item.get("wind", {}).get("speed"),
-                  "sunrise": to_local_time(data.get("city", {}).get("sunrise", 0)),
-                  "sunset": to_local_time(data.get("city", {}).get("sunset", 0))
-
-                  }
-
-        infolist.append(mydict)
     return {
         "city": city_info,
         "forecast": infolist
     }
 
 
+def filter_forecast_columns(data, as_frame=True):
+    """ Columnar version of filter_forecast_data for bulk jobs and DataFrame consumers.
+    Every field is pulled straight into a typed array and the dates are built vectorized
+    from the dt epochs, so there is no strftime / pd.to_datetime round-trip per row.
+    Args:
+        data(JSON): forecast data
+        as_frame (bool): return a pandas DataFrame (default) or a dict of NumPy arrays
+    Returns:
+        dict: {"city": metadata dictionary (with sunrise/sunset), "forecast": DataFrame or dict of arrays}
+              The "date" column is tz-aware in the city's local time (a UTC datetime64 array when as_frame=False).
+              Missing numbers are NaN.
+    """
+
+    city = data.get("city", {})
+    offset = city.get("timezone", 0)
+    tz = _tz_for_offset(offset)
+
+    city_info = {
+        "city": city.get("name", "-"),
+        "latitude": city.get("coord", {}).get("lat"),
+        "longitude": city.get("coord", {}).get("lon"),
+        "country": city.get("country", "-"),
+        "timezone": offset,
+        "sunrise": _local_time(city.get("sunrise", 0), tz),
+        "sunset": _local_time(city.get("sunset", 0), tz),
+    }
+
+    import numpy as np
+
+    items = data.get("list", [])
+    count = len(items)
+    mains = [item.get("main", {}) for item in items]
+    weathers = [(item.get("weather") or [{}])[0] for item in items]
+    winds = [item.get("wind", {}) for item in items]
+
+    def numbers(rows, field):
+        return np.fromiter((_nan_if_none(row.get(field)) for row in rows), dtype="float64", count=count)
+
+    epochs = np.fromiter((item.get("dt", 0) for item in items), dtype="int64", count=count)
+
+    columns = {
+        "date": epochs.astype("datetime64[s]"),
+        "temperature": numbers(mains, "temp"),
+        "feels_like": numbers(mains, "feels_like"),
+        "weather_description": np.array([w.get("description", "-") for w in weathers], dtype=object),
+        "weather_icon": np.array([weather_emoji.get(w.get("icon", "-"), default_emoji) for w in weathers],
+                                 dtype=object),
+        "pressure": numbers(mains, "pressure"),
+        "humidity": numbers(mains, "humidity"),
+        "visibility": numbers(items, "visibility"),
+        "wind_speed": numbers(winds, "speed"),
+        "wind_deg": numbers(winds, "deg"),
+        "clouds": np.fromiter((_nan_if_none(item.get("clouds", {}).get("all")) for item in items),
+                              dtype="float64", count=count),
+        "pop": numbers(items, "pop"),
+    }
+
+    if not as_frame:
+        return {"city": city_info, "forecast": columns}
+
+    import pandas as pd
+
+    with metrics.span("dataframe"):
+        frame = pd.DataFrame(columns)
+        frame["date"] = pd.to_datetime(epochs, unit="s", utc=True).tz_convert(tz)
+    return {"city": city_info, "forecast": frame}
+
+
+_nan = float("nan")
+
 
+def _nan_if_none(value):
+    return _nan if value is None else value
@@ -0,0 +1,292 @@
+import asyncio
+import weakref
+
+import aiohttp
+
+import weather_api
+import weather_json
+import weather_metrics as metrics
+from weather_api import (RateLimited, _cache_get, _cache_set, _current_params, _forecast_params, _no_location,
+                         _resolve_location, _unknown_city, _rate_limited, _stale_fields, _stale_or, _unavailable,
+                         _filter_current_data, filter_forecast_data, async_inflight, retry_statuses)
+
+
+class AsyncWeatherClient:
+    """ asyncio client mirroring weather_api, sharing its cache, parsers and result format.
+    Args:
+        base_url (str): API root, defaults to weather_api.default_base_url
+        pool_size (int): maximum open connections in the shared pool
+        max_concurrency (int): maximum requests in flight at once across all calls
+        timeout (float): total timeout of one request in seconds
+        retries (int): retry attempts on 429/5xx responses and failed connections
+        backoff (float): exponential backoff factor in seconds between retries
+    Use it as an async context manager (or call close()) so the connection pool is released.
+    """
+
+    def __init__(self, base_url=None, pool_size=100, max_concurrency=50, timeout=10, retries=3, backoff=0.5):
+        self.base_url = (base_url or weather_api.default_base_url).rstrip("/")
+        self.pool_size = pool_size
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def _get_json(self, endpoint, params):
+        """ GET base_url/endpoint with retry-with-backoff on 429/5xx and connection errors.
+        Requests count against weather_api.rate_limiter like the sync ones: callers queue for up to
+        rate_limit_wait seconds, a 429 blocks the limiter for its Retry-After and is only retried when
+        that fits into the wait, otherwise RateLimited is raised.
+        """
+        url = f"{self.base_url}/{endpoint}"
+        # requests silently drops None values (e.g. a missing api key), aiohttp rejects them
+        params = {k: v for k, v in params.items() if v is not None}
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + weather_api.rate_limit_wait
+        attempt = 0
+        while True:
+            throttled = False
+            limiter = weather_api.rate_limiter
+            # acquire blocks (and may touch a shared SQLite file), keep it off the event loop
+            if limiter is not None and not await loop.run_in_executor(None, limiter.acquire,
+                                                                      max(0.0, deadline - loop.time())):
+                raise RateLimited("Request budget of the API key exhausted")
+
+            try:
+                async with self._semaphore:
+                    async with self._get_session().get(url, params=params) as response:
+                        if response.status == 429:
+                            throttled = True
+                            weather_api.rate_limited_responses += 1
+                            retry_after = _retry_after(response)
+                            if limiter is not None:
+                                await loop.run_in_executor(None, limiter.block_for,
+                                                           retry_after or weather_api.default_retry_after)
+                            delay = retry_after or self.backoff * (2 ** attempt)
+                            if attempt >= self.retries or loop.time() + delay > deadline:
+                                raise RateLimited(f"Rate limited by the API for {delay:.0f}s")
+                        elif response.status in retry_statuses and attempt < self.retries:
+                            delay = self.backoff * (2 ** attempt)
+                        else:
+                            response.raise_for_status()
+                            return weather_json.decode(await response.read(), endpoint)
+            except aiohttp.ClientConnectionError:
+                if attempt >= self.retries:
+                    raise
+                delay = self.backoff * (2 ** attempt)
+
+            attempt += 1
+            # with a limiter the next acquire waits out the block
+            if limiter is None or not throttled:
+                await asyncio.sleep(delay)
+
+    async def get_current_data(self, city=None, lat=None, lon=None, timeout=None):
+        """ async version of weather_api.get_current_data
+        Args:
+            city (str): City name or
+            lat, lon (float): latitude and longitude
+            timeout (float): optional overall deadline for this call in seconds
+        Returns:
+            A python dictionary {success, data, error}
+        """
+
+        params = _current_params(city, lat, lon)
+        if params is None:
+            return _no_location()
+
+        params, key = _resolve_location("weather", params)
+        if key is None:
+            return _unknown_city()
+
+        cached = _cache_get(key)
+        if cached is not None:
+            return cached
+
+        try:
+            return await asyncio.wait_for(async_inflight.do(key, lambda: self._fetch_current(key, params)), timeout)
+        except asyncio.TimeoutError:
+            return {"success": False, "error": "Error: Request timed out, Try again later.", "data": None}
+
+    async def _fetch_current(self, key, params):
+        try:
+            data = await self._get_json("weather", params)
+            with metrics.span("parse_current"):
+                result = {"success": True, "data": _filter_current_data(data), "error": None}
+            _cache_set(key, result, weather_api.current_ttl)
+            return result
+
+        except RateLimited:
+            return _rate_limited(key)
+
+        except asyncio.TimeoutError:
+            return _stale_or(key, "Error: Request timed out, Try again later.")
+
+        except aiohttp.ClientConnectionError:
+            return _stale_or(key, "Error: Network problem, Check your internet connection")
+
+        except aiohttp.ClientResponseError as e:
+            # a 5xx still failing after the retries is the service, not the request
+            if e.status >= 500:
+                return _unavailable(key)
+            return {"success": False, "error": "Error: Invalid city name or coordinates", "data": None}
+
+        except Exception as e:
+            return {"success": False, "error": f"Unexpected error: {e}", "data": None}
+
+    async def get_forecast_data(self, city=None, lat=None, lon=None, timeout=None):
+        """ async version of weather_api.get_forecast_data, see get_current_data for the arguments """
+
+        params = _forecast_params(city, lat, lon)
+        if params is None:
+            return _no_location()
+
+        params, key = _resolve_location("forecast", params)
+        if key is None:
+            return _unknown_city()
+
+        cached = _cache_get(key)
+        if cached is not None:
+            return cached
+
+        try:
+            return await asyncio.wait_for(async_inflight.do(key, lambda: self._fetch_forecast(key, params)), timeout)
+        except asyncio.TimeoutError:
+            return {"success": False, "error": "Unable to fetch weather data at the moment. Please try again later.",
+                    "data": None}
+
+    async def _fetch_forecast(self, key, params):
+        try:
+            data = await self._get_json("forecast", params)
+            with metrics.span("parse_forecast"):
+                result = {"success": True, "data": filter_forecast_data(data), "error": None}
+            _cache_set(key, result, weather_api.forecast_ttl)
+            return result
+
+        except RateLimited:
+            return _rate_limited(key)
+
+        except aiohttp.ClientResponseError as e:
+            if e.status >= 500:
+                return _unavailable(key)
+            return {"success": False, "error": "Unable to fetch weather data at the moment. Please try again later.",
+                    "data": None}
+
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return _stale_or(key, "Unable to fetch weather data at the moment. Please try again later.")
+
+        except Exception as e:
+            # a malformed body (decode or parse error) must not abort a bulk run
+            return {"success": False, "error": f"Unexpected error: {e}", "data": None}
+
+    async def get_multiple_city(self, cities):
+        """ async version of weather_api.get_multiple_city, results keep the input order """
+        return weather_api._collect([pair async for pair in self.iter_multiple_city(cities)])
+
+    async def get_multiple_location(self, coordinates):
+        """ async version of weather_api.get_multiple_location, results keep the input order """
+        return weather_api._collect([pair async for pair in self.iter_multiple_location(coordinates)])
+
+    def iter_multiple_city(self, cities):
+        """ Async generator of (index, result) pairs in completion order """
+        return self._bulk(self._city_result, cities)
+
+    def iter_multiple_location(self, coordinates):
+        """ Async generator of (index, result) pairs in completion order """
+        return self._bulk(self._location_result, coordinates)
+
+    async def _city_result(self, city):
+        res = await self.get_current_data(city=city)
+        return {"city": city, "success": res["success"], "data": res["data"], "error": res["error"],
+                **_stale_fields(res)}
+
+    async def _location_result(self, coordinate):
+        lat, lon = coordinate
+        res = await self.get_current_data(lat=lat, lon=lon)
+        return {"lat": lat, "lon": lon, "success": res["success"], "data": res["data"], "error": res["error"],
+                **_stale_fields(res)}
+
+    async def _bulk(self, worker, items):
+        """ Run worker over items keeping a bounded window of tasks, so inputs of any size use flat memory """
+        window = self.max_concurrency * 2
+        items = enumerate(items)
+        pending = {}
+
+        def refill(n):
+            for _ in range(n):
+                try:
+                    index, item = next(items)
+                except StopIteration:
+                    return
+                pending[asyncio.ensure_future(worker(item))] = index
+
+        refill(window)
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield pending.pop(task), task.result()
+                refill(len(done))
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+
+# one default client per event loop, aiohttp sessions can't be shared between loops
+_default_clients = weakref.WeakKeyDictionary()
+
+
+def default_client():
+    """ Return the AsyncWeatherClient of the running event loop, creating it on first use """
+    loop = asyncio.get_running_loop()
+    client = _default_clients.get(loop)
+    if client is None:
+        client = _default_clients[loop] = AsyncWeatherClient()
+    return client
+
+
+async def close_default_client():
+    client = _default_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+async def get_current_data(city=None, lat=None, lon=None, timeout=None):
+    return await default_client().get_current_data(city, lat, lon, timeout=timeout)
+
+
+async def get_forecast_data(city=None, lat=None, lon=None, timeout=None):
+    return await default_client().get_forecast_data(city, lat, lon, timeout=timeout)
+
+
+async def get_multiple_city(cities):
+    return await default_client().get_multiple_city(cities)
+
+
+async def get_multiple_location(coordinates):
+    return await default_client().get_multiple_location(coordinates)
@@ -0,0 +1,83 @@
+import threading
+import time
+
+
+class CircuitBreaker:
+    """ Fail fast while the upstream API is down instead of letting every caller wait for its timeout.
+    Args:
+        failure_threshold (int): consecutive failed requests (timeouts, connection errors, 5xx) that open it
+        reset_timeout (float): seconds it stays open before a probe request is let through
+    closed: every request goes through, failures are counted
+    open: requests are refused until reset_timeout has passed
+    half-open: one probe at a time goes through, a success closes it, a failure opens it again
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.rejected = 0
+        self.trips = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state(time.monotonic())
+
+    @property
+    def is_open(self):
+        """ True while requests are refused without a probe being due """
+        return self.state == "open"
+
+    def allow(self):
+        """ Whether a request may go out now; in half-open state only one caller gets True at a time """
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.probing:
+                self.probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            # a failed probe re-opens it for another reset_timeout
+            if self.probing or (self.opened_at is None and self.failures >= self.failure_threshold):
+                if self.opened_at is None:
+                    self.trips += 1
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+    def release(self):
+        """ Give back a probe allowed by allow() whose request was never sent """
+        with self._lock:
+            self.probing = False
+
+    def reset(self):
+        self.record_success()
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            return {"state": self._state(now), "failures": self.failures, "trips": self.trips,
+                    "rejected": self.rejected,
+                    "open_for": 0.0 if self.opened_at is None else round(now - self.opened_at, 1)}
+
+    def _state(self, now):
+        if self.opened_at is None:
+            return "closed"
+        if self.probing or now - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
@@ -0,0 +1,197 @@
+import csv
+import gzip
+import json
+import os
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import NamedTuple
+
+# bundled sample of major cities; point weather_city_list at OpenWeather's city.list.json(.gz) for the full index
+default_path = os.getenv("weather_city_list",
+                         os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cities.csv"))
+
+
+class City(NamedTuple):
+    id: int
+    name: str
+    country: str
+    lat: float
+    lon: float
+
+
+class CityIndex:
+    """ Local city name -> OpenWeather city ID / coordinates index.
+    Entries are kept in parallel arrays sorted by normalized name, so a lookup is a binary search.
+    Args:
+        path (str): CSV file (id,name,country,lat,lon) or OpenWeather city.list.json, optionally gzipped
+        authoritative (bool): the list is complete, so names missing from it are invalid.
+                              Defaults to True for OpenWeather's JSON city list and False for the bundled sample.
+    """
+
+    def __init__(self, path=None, authoritative=None):
+        self.path = path or default_path
+        self.authoritative = (".json" in os.path.basename(self.path)) if authoritative is None else authoritative
+        self._trigrams = None
+        rows = sorted(_read_rows(self.path), key=lambda row: (normalize(row[1]), row[2], row[0]))
+
+        self.keys = [normalize(row[1]) for row in rows]
+        self.names = [row[1] for row in rows]
+        self.countries = [row[2] for row in rows]
+        self.ids = array("q", (row[0] for row in rows))
+        self.lats = array("d", (row[3] for row in rows))
+        self.lons = array("d", (row[4] for row in rows))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def city(self, position):
+        return City(self.ids[position], self.names[position], self.countries[position],
+                    self.lats[position], self.lons[position])
+
+    def lookup(self, name):
+        """ All cities matching a name, optionally qualified with a country code ("London, GB").
+        Returns:
+            list of City
+        """
+        key, country = _split_country(name)
+        position = bisect_left(self.keys, key)
+        matches = []
+        while position < len(self.keys) and self.keys[position] == key:
+            if country is None or self.countries[position] == country:
+                matches.append(self.city(position))
+            position += 1
+        return matches
+
+    def geocode(self, name):
+        """ The City for an unambiguous (or country qualified) name, otherwise None.
+        Names shared by several cities (e.g. London GB / London CA) only geocode with a country code,
+        so they keep going through the API's own q= lookup.
+        """
+        matches = self.lookup(name)
+        if len({city.id for city in matches}) == 1:
+            return matches[0]
+        return None
+
+    def rejects(self, name):
+        """ Whether name is certainly not a city: the index is authoritative, the query is a bare name or
+        "name, CC" with a two letter country code, and no city of that name exists in any country.
+        Other forms ("New York, NY, US") and country aliases the list doesn't use ("London,uk") are left to the API.
+        """
+        if not self.authoritative:
+            return False
+        city, _, country = str(name).partition(",")
+        country = country.strip()
+        if country and not (len(country) == 2 and country.isalpha()):
+            return False
+        return not self.lookup(city)
+
+    def prefix(self, text, limit=10):
+        """ Cities whose name starts with text, in name order. Binary search, then a scan of at most limit hits. """
+        key, country = _split_country(text)
+        position = bisect_left(self.keys, key)
+        matches = []
+        while position < len(self.keys) and len(matches) < limit and self.keys[position].startswith(key):
+            if country is None or self.countries[position].startswith(country):
+                matches.append(self.city(position))
+            position += 1
+        return matches
+
+    def fuzzy(self, text, limit=5, cutoff=0.6):
+        """ Closest city names to a possibly misspelled text, best first.
+        Candidates come from a trigram index and are ranked with difflib's similarity ratio.
+        """
+        key, country = _split_country(text)
+        if not key:
+            return []
+
+        postings = self._trigram_index()
+        counts = Counter()
+        for gram in _trigrams(key):
+            counts.update(postings.get(gram, ()))
+
+        scored = []
+        for position, _ in counts.most_common(limit * 20):
+            if country is not None and self.countries[position] != country:
+                continue
+            score = SequenceMatcher(None, key, self.keys[position]).ratio()
+            if score >= cutoff:
+                scored.append((-score, position))
+
+        return [self.city(position) for _, position in sorted(scored)[:limit]]
+
+    def suggest(self, text, limit=8):
+        """ "Name, CC" labels for autocomplete: prefix matches first, then fuzzy matches """
+        labels = []
+        for city in self.prefix(text, limit) + self.fuzzy(text, limit):
+            label = f"{city.name}, {city.country}"
+            if label not in labels:
+                labels.append(label)
+        return labels[:limit]
+
+    def _trigram_index(self):
+        if self._trigrams is None:
+            postings = {}
+            for position, key in enumerate(self.keys):
+                for gram in _trigrams(key):
+                    postings.setdefault(gram, array("l")).append(position)
+            self._trigrams = postings
+        return self._trigrams
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def normalize(name):
+    """ Case, accent and whitespace insensitive form of a city name """
+    name = unicodedata.normalize("NFKD", str(name))
+    name = "".join(ch for ch in name if not unicodedata.combining(ch))
+    return " ".join(name.split()).casefold()
+
+
+def _split_country(name):
+    city, _, country = str(name).partition(",")
+    country = country.strip().upper()
+    return normalize(city), (country or None)
+
+
+def _read_rows(path):
+    """ Yield (id, name, country, lat, lon) rows from a CSV or OpenWeather JSON city list """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        if ".json" in os.path.basename(path):
+            for item in json.load(f):
+                coord = item.get("coord", {})
+                yield (int(item["id"]), item["name"], item.get("country", ""),
+                       float(coord.get("lat", "nan")), float(coord.get("lon", "nan")))
+        else:
+            for row in csv.DictReader(f):
+                yield int(row["id"]), row["name"], row["country"], float(row["lat"]), float(row["lon"])
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def default_index():
+    """ The shared CityIndex loaded from default_path, or None when no city list is available """
+    global _default_index
+    if _default_index is None:
+        with _default_lock:
+            if _default_index is None:
+                try:
+                    _default_index = CityIndex()
+                except (OSError, ValueError, KeyError):
+                    _default_index = False
+    return _default_index or None
+
+
+def suggest(text, limit=8):
+    """ Autocomplete labels from the default index (empty when no city list is available) """
+    index = default_index()
+    return index.suggest(text, limit) if index is not None and str(text).strip() else []
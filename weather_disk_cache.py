@@ -0,0 +1,127 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+default_path = os.path.join(os.path.expanduser("~"), ".cache", "one_weather", "cache.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL
+);
+CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at);
+"""
+
+
+class DiskCache:
+    """ SQLite backed TTL cache for parsed weather results, safe to share between processes.
+    Args:
+        path (str): database file, created on first use
+        max_bytes (int): size cap for stored values, oldest entries are compacted away above it
+        compact_every (int): run a compaction pass after this many writes
+    Values must be JSON serializable. Keys are any JSON serializable value (tuples are stored as lists).
+    """
+
+    def __init__(self, path=None, max_bytes=256 * 1024 * 1024, compact_every=200):
+        self.path = path or default_path
+        self.max_bytes = max_bytes
+        self.compact_every = compact_every
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        if "stored_at" not in {row[1] for row in conn.execute("PRAGMA table_info(cache)")}:
+            # files written before the fetch time was kept, their rows count as just stored
+            conn.execute("ALTER TABLE cache ADD COLUMN stored_at REAL")
+
+    def _connect(self):
+        """ One connection per thread, sqlite3 connections can't be shared between threads """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            # auto_vacuum only takes effect on a new file, before switching to WAL writes its header
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            # WAL lets readers in other processes keep going while one process writes
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("PRAGMA busy_timeout = 30000")
+            self._local.conn = conn
+        return conn
+
+    def lookup(self, key):
+        """ Return (value, seconds_left, age in seconds) for a live entry, or None when missing or expired """
+        row = self._connect().execute("SELECT value, expires_at, stored_at FROM cache WHERE key = ?",
+                                      (_encode_key(key),)).fetchone()
+        now = time.time()
+        if row is None or row[1] <= now:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return json.loads(row[0]), row[1] - now, max(0.0, now - (row[2] or now))
+
+    def get(self, key):
+        """ Return the cached value for key, or None when missing or expired """
+        found = self.lookup(key)
+        return None if found is None else found[0]
+
+    def set(self, key, value, ttl):
+        """ Store value under key for ttl seconds """
+        payload = json.dumps(value, separators=(",", ":"))
+        now = time.time()
+        self._connect().execute("INSERT OR REPLACE INTO cache (key, value, expires_at, size, stored_at) "
+                                "VALUES (?, ?, ?, ?, ?)", (_encode_key(key), payload, now + ttl, len(payload), now))
+
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self.compact_every == 0
+        if due:
+            self.compact()
+
+    def compact(self):
+        """ Drop expired entries, then the entries closest to expiry until under max_bytes, and release free pages """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+            conn.execute("""
+                DELETE FROM cache WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (ORDER BY expires_at DESC, key) AS running FROM cache
+                    ) WHERE running > ?
+                )""", (self.max_bytes,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("PRAGMA incremental_vacuum")
+
+    def clear(self):
+        self._connect().execute("DELETE FROM cache")
+
+    def stats(self):
+        """ Hit/miss counters of this process plus the number and size of stored entries """
+        entries, size = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def _encode_key(key):
+    return json.dumps(key, separators=(",", ":"))
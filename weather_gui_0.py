@@ -1,6 +1,5 @@
 import streamlit as st
-from weather_api import *
-import pandas as pd
+from weather_api import get_current_data
 
 st.title("One Weather")
 st.divider()
@@ -22,14 +21,14 @@ with st.form(key="hello"):
             city = st.text_input("Enter city name: ")
             lat, lon = None, None
 
-    info = get_current_data(city, lat, lon)
-
     main_btn = st.form_submit_button()
 
 st.subheader("Weather Details: ")
 
 
 if main_btn:
+    # only fetch on submit, not on every rerun of the form
+    info = get_current_data(city, lat, lon)
     if info["error"]:
         st.write(info["error"])
     else:
@@ -1,7 +1,11 @@
 import streamlit as st
-from weather_api import get_current_data, get_forecast_data
+from weather_api import get_current_data, get_forecast_data, current_ttl, forecast_ttl
+from weather_cities import suggest
+from weather_scheduler import start_scheduler, read_watch_list
 from datetime import datetime
 import pandas as pd
+import os
+import weather_metrics
 
 
 # ******************  Helper functions  *************************
@@ -63,10 +67,10 @@ def tile(row):
         flex-direction:column;
         justify-content:center;
         margin-bottom:16px; ">
-        <div style="font-size:18px;">  {row["date"].strftime('%A, %d-%m-%Y')} </div>    
-        <div style="font-size:18px;">  {row["date"].strftime('%I:%M %p')} </div>
+        <div style="font-size:18px;">  {row["long_day"]} </div>    
+        <div style="font-size:18px;">  {row["time"]} </div>
         <div style="font-size:24px;">{row["weather_icon"]} </div>
-        <div class="subheading_1">{row["temperature"]:.0f}°C </div>
+        <div class="subheading_1">{row["temperature"]}°C </div>
         <div style="font-size:14px;">{row["weather_description"]}</div>
     </div>
     """
@@ -74,10 +78,7 @@ def tile(row):
 def forecast_heading():
     columns = ["Date", "Temperature", "Description", "Humidity", "Pressure"]
 
-    mystr = ""
-
-    for col in columns:
-        mystr += f'<div style="flex:1; text-align:center;">{col}</div>'
+    mystr = "".join(f'<div style="flex:1; text-align:center;">{col}</div>' for col in columns)
 
     return f"""
         <div style="
@@ -106,12 +107,12 @@ def forecast_row(row):
         margin-bottom:12px;
     ">
         <div class="forecast_row">
-            <div style="font-size:16px; font-weight:600;"> {row['date'].strftime('%a %d %b')} </div>
-            <div style="font-size:13px; color:#9ca3af;"> {row['date'].strftime('%I:%M %p')} </div>
+            <div style="font-size:16px; font-weight:600;"> {row['day']} </div>
+            <div style="font-size:13px; color:#9ca3af;"> {row['time']} </div>
         </div>
         <div class="forecast_row">
-            <div style="font-size:18px; font-weight:600;"> {row['temperature']:.0f}°C </div>
-            <div style="font-size:14px; color:#9ca3af;">Feels like: {row['feels_like']:.0f}°C </div>
+            <div style="font-size:18px; font-weight:600;"> {row['temperature']}°C </div>
+            <div style="font-size:14px; color:#9ca3af;">Feels like: {row['feels_like']}°C </div>
         </div>            
         <div class="forecast_row"> {row['weather_description']}  {row['weather_icon']} </div>
         <div class="forecast_row"> 💧  {row['humidity']}%</div>
@@ -119,6 +120,94 @@ def forecast_row(row):
     </div>
     """
 
+def format_forecast(df):
+    """ Display strings for every forecast slot, built column by column instead of row by row """
+    dates = df["date"].dt
+    return pd.DataFrame({
+        "long_day": dates.strftime("%A, %d-%m-%Y"),
+        "day": dates.strftime("%a %d %b"),
+        "time": dates.strftime("%I:%M %p"),
+        "temperature": df["temperature"].map("{:.0f}".format),
+        "feels_like": df["feels_like"].map("{:.0f}".format),
+        "weather_description": df["weather_description"],
+        "weather_icon": df["weather_icon"],
+        "humidity": df["humidity"].map("{:.0f}".format),
+        "pressure": df["pressure"].map("{:.0f}".format),
+    }).to_dict("records")
+
+
+# the finished HTML is cached on the forecast payload, so reruns (widget clicks) skip all the formatting
+@st.cache_data(show_spinner=False)
+def forecast_tiles_html(df):
+    return [tile(row) for row in format_forecast(df.head(8))]
+
+
+@st.cache_data(show_spinner=False)
+def forecast_table_html(df):
+    df_rows = "".join(forecast_row(row) for row in format_forecast(df))
+    headers = forecast_heading()
+
+    return f"""
+            <div style="
+                max-height:600px;
+                background: #1e293d;
+                border: 3px solid #334155;
+                border-radius: 16px;
+            ">
+                <div>{headers}</div>
+                <div style="
+                    max-height: 320px;
+                    overflow-y: auto;
+                    background: #1e293b;
+                    padding: 16px;
+                ">
+                {df_rows}</div>
+            </div>
+            """
+
+
+class FetchFailed(Exception):
+    """ Raised inside the cached fetches, so failed and stale lookups are not cached """
+
+
+@st.cache_data(ttl=current_ttl, show_spinner=False)
+def fetch_current(city, lat, lon):
+    result = get_current_data(city, lat, lon)
+    if not result["success"] or result.get("stale"):
+        raise FetchFailed(result)
+    return result
+
+
+@st.cache_data(ttl=forecast_ttl, show_spinner=False)
+def fetch_forecast(city, lat, lon):
+    result = get_forecast_data(city=city, lat=lat, lon=lon, columnar=True)
+    if not result["success"] or result.get("stale"):
+        raise FetchFailed(result)
+    return result
+
+
+def cached_fetch(fetch, city, lat, lon):
+    try:
+        return fetch(city, lat, lon)
+    except FetchFailed as e:
+        return e.args[0]
+
+
+def debug_panel():
+    """ Per-stage timings, counters and cache stats collected by weather_metrics """
+    snapshot = weather_metrics.snapshot()
+    with st.expander("🛠 Debug: timings & metrics"):
+        if snapshot["histograms"]:
+            st.write("***Latency per stage (ms)***")
+            st.dataframe(pd.DataFrame(snapshot["histograms"]).round(3), hide_index=True)
+        if snapshot["counters"]:
+            st.write("***Counters***")
+            st.dataframe(pd.DataFrame(snapshot["counters"]), hide_index=True)
+        if snapshot["cache"]:
+            st.write("***Response cache***")
+            st.json(snapshot["cache"])
+        st.download_button("Prometheus metrics", weather_metrics.prometheus_text(), file_name="weather_metrics.prom")
+
 # ********************* CSS ****************************
 
 st.markdown(
@@ -166,6 +255,10 @@ st.markdown(
 
 # ********************* User Handling ****************************
 
+# keep the cache warm for a watch-list of locations (one background thread per server process)
+if os.getenv("weather_watch_list"):
+    start_scheduler(read_watch_list(os.getenv("weather_watch_list")))
+
 st.set_page_config(
     page_title="One Weather",
     page_icon="🌤️",
@@ -205,9 +298,16 @@ with c1:
         city = st.text_input("City name")
         lat, lon = None, None
 
+        # autocomplete / typo suggestions from the local city index
+        typed = city
+        suggestions = [s for s in suggest(typed) if s.casefold() != typed.strip().casefold()]
+        if suggestions:
+            city = st.selectbox("Matching cities", [typed] + suggestions,
+                                format_func=lambda s: f"{s} (as typed)" if s == typed else s)
+
 if st.button("Get Weather"):
     with st.spinner("Fetching weather..."):
-        st.session_state.weather_data = get_current_data(city, lat, lon)
+        st.session_state.weather_data = cached_fetch(fetch_current, city, lat, lon)
         st.session_state.forecast_data = None
 
 st.markdown("""
@@ -277,7 +377,7 @@ if forecast_btn:
 
     if st.session_state.forecast_data is None:
         with st.spinner("Fetching Forecast data..."):
-            st.session_state.forecast_data = get_forecast_data(city=city, lat=lat, lon=lon)
+            st.session_state.forecast_data = cached_fetch(fetch_forecast, city, lat, lon)
 
     fc_info = st.session_state.forecast_data
 
@@ -285,18 +385,18 @@ if forecast_btn:
         st.header("🌤 Forecast Data")
         st.subheader("24 Hour forecast Data: ")
 
-        df = pd.DataFrame(fc_info["data"]["forecast"])
-        df["date"] = pd.to_datetime(df["date"])
+        df = fc_info["data"]["forecast"]
 
 
         # ---------------Tiles
-        df_forecast = df.head(8)
+        with weather_metrics.span("render_html"):
+            tiles = forecast_tiles_html(df)
         for i in range(0, 8, 4):
             cols = st.columns(4)
 
-            for col, (_, row) in zip(cols, df_forecast.iloc[i:i + 4].iterrows()):
+            for col, tile_html in zip(cols, tiles[i:i + 4]):
                 with col:
-                    st.markdown(tile(row), unsafe_allow_html=True)
+                    st.markdown(tile_html, unsafe_allow_html=True)
 
 
 # ------------------ other
@@ -304,32 +404,15 @@ if forecast_btn:
 
         st.subheader("🕒 5-Day Detailed Forecast")
 
-        df_rows = ""
-        for i, row in df.iterrows():
-            df_rows += forecast_row(row)
-
-        headers = forecast_heading()
-
-        st.markdown(
-            f"""
-            <div style="
-                max-height:600px;
-                background: #1e293d;
-                border: 3px solid #334155;
-                border-radius: 16px;
-            ">
-                <div>{headers}</div>
-                <div style="
-                    max-height: 320px;
-                    overflow-y: auto;
-                    background: #1e293b;
-                    padding: 16px;
-                ">
-                {df_rows}</div>
-            </div>
-            """,
-            unsafe_allow_html=True)
+        with weather_metrics.span("render_html"):
+            table_html = forecast_table_html(df)
+        st.markdown(table_html, unsafe_allow_html=True)
 
     else:
         st.error(fc_info["error"])
 
+
+# ************************  Debug *************************
+# only with weather_metrics=1 in the environment
+if weather_metrics.enabled:
+    debug_panel()
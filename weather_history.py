@@ -0,0 +1,401 @@
+""" Append-only local time-series store of fetched observations and forecast snapshots.
+
+Every fresh result weather_api fetches can be recorded here (see weather_api.enable_history), so
+trends and forecast-vs-actual comparisons don't need the API again. Data is kept in Parquet chunk
+files partitioned by kind, location and UTC day:
+
+    <root>/current/location=coord_28.61_77.23/day=2024-05-01/chunk-<time>-<pid>-<seq>.parquet
+    <root>/forecast/location=.../day=<day the forecast was fetched>/...
+
+Writes are queued and flushed in batches by a background thread, never on the request path.
+Needs pyarrow (and pandas for DataFrame results).
+"""
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone, timedelta
+
+from weather_api import time_format, _current_params, _resolve_location
+
+default_path = os.path.join(os.path.expanduser("~"), ".cache", "one_weather", "history")
+
+kinds = ("current", "forecast")
+
+# time column used for range queries and day partitions of each kind
+time_columns = {"current": "observed_at", "forecast": "issued_at"}
+
+# queue marker that ends the current batch early
+_flush_now = object()
+
+_numbers = ("temperature", "feels_like", "pressure", "humidity", "visibility", "wind_speed")
+
+
+class HistoryStore:
+    """ Batched, append-only writer and range query API over the chunk files.
+    Args:
+        path (str): root directory, defaults to ~/.cache/one_weather/history
+        flush_rows (int): write a batch as soon as this many results are queued
+        flush_interval (float): otherwise write whatever is queued every this many seconds
+        max_queue (int): results waiting to be written, further results are dropped (and counted)
+    """
+
+    def __init__(self, path=None, flush_rows=1000, flush_interval=5.0, max_queue=100000):
+        self.path = path or default_path
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.Queue(max_queue)
+        self._queued = 0
+        self._done = 0
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._progress = threading.Condition(self._lock)
+        self._thread = None
+        self._closed = False
+
+    def record(self, endpoint, key, result):
+        """ Queue a freshly fetched weather_api result, returns immediately (weather_api result listener) """
+        if self._closed or not result.get("success"):
+            return
+        with self._lock:
+            try:
+                self._queue.put_nowait((endpoint, key, result, time.time()))
+            except queue.Full:
+                self.dropped += 1
+                return
+            self._queued += 1
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="weather-history", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.flush_rows:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._write(batch)
+                    return
+                if item is _flush_now:
+                    break
+                batch.append(item)
+            self._write(batch)
+
+    def _finished(self, count):
+        with self._progress:
+            self._done += count
+            self._progress.notify_all()
+
+    def _write(self, batch):
+        """ Turn a batch of results into one chunk file per (kind, location, day) partition """
+        if not batch:
+            return
+        try:
+            self._write_partitions(batch)
+        finally:
+            self._finished(len(batch))
+
+    def _write_partitions(self, batch):
+        partitions = {}
+        for endpoint, key, result, fetched_at in batch:
+            try:
+                kind = "current" if endpoint == "weather" else "forecast"
+                rows = _observation_rows if kind == "current" else _forecast_rows
+                for row in rows(key, result["data"], fetched_at):
+                    day = _day(row[time_columns[kind]])
+                    partitions.setdefault((kind, row["location"], day), []).append(row)
+            except Exception:
+                self.failed += 1
+
+        for (kind, location, day), rows in partitions.items():
+            try:
+                self._write_chunk(kind, location, day, rows)
+                self.written += len(rows)
+            except Exception:
+                self.failed += len(rows)
+
+    def _write_chunk(self, kind, location, day, rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        directory = self._partition(kind, location, day)
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self._seq += 1
+            name = f"chunk-{time.time_ns()}-{os.getpid()}-{self._seq}.parquet"
+
+        table = pa.Table.from_pylist(rows, schema=_schema(kind))
+        # write under a temporary name so readers never see a half written chunk
+        temporary = os.path.join(directory, "." + name)
+        pq.write_table(table, temporary)
+        os.replace(temporary, os.path.join(directory, name))
+
+    def _partition(self, kind, location, day):
+        return os.path.join(self.path, kind, f"location={location}", f"day={day}")
+
+    def flush(self, timeout=None):
+        """ Write everything recorded so far now and wait for it.
+        Returns:
+            False on timeout
+        """
+        with self._progress:
+            target = self._queued
+            if self._done >= target:
+                return True
+        # outside the lock: record() and the writer need it, and on a full queue the writer is draining anyway
+        try:
+            self._queue.put_nowait(_flush_now)
+        except queue.Full:
+            pass
+        with self._progress:
+            return self._progress.wait_for(lambda: self._done >= target, timeout)
+
+    def close(self, timeout=None):
+        """ Write everything still queued and stop the writer thread """
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def locations(self, kind="current"):
+        """ Location ids with stored data of this kind """
+        directory = os.path.join(self.path, kind)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name.split("=", 1)[1] for name in os.listdir(directory) if name.startswith("location="))
+
+    def query(self, kind="current", location=None, start=None, end=None, columns=None, as_frame=True):
+        """ Stored rows of one kind in a time window.
+        Args:
+            kind (str): "current" (observations) or "forecast" (forecast slots, one row per slot and snapshot)
+            location (str): a location id (see location_id), a list of them, or None for every location
+            start, end (datetime or epoch seconds): window on observed_at / issued_at, start inclusive, end exclusive
+            columns (list): subset of columns to read
+            as_frame (bool): return a pandas DataFrame (default) or a dict of NumPy arrays
+        Returns:
+            rows sorted by location and time, repeated observations (same location and observed_at) only once
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        start, end = _to_epoch(start), _to_epoch(end)
+        files = self._chunk_files(kind, location, start, end)
+        schema = _schema(kind)
+        if columns is not None:
+            columns = list(dict.fromkeys(["location", time_columns[kind]] + list(columns)))
+            schema = pa.schema([schema.field(name) for name in columns])
+
+        tables = [pq.read_table(path, columns=columns, schema=_schema(kind)) for path in files]
+        table = pa.concat_tables(tables) if tables else schema.empty_table()
+
+        moment = table[time_columns[kind]]
+        mask = None
+        if start is not None:
+            mask = pc.greater_equal(moment, pa.scalar(start, pa.timestamp("s", "UTC")))
+        if end is not None:
+            before = pc.less(moment, pa.scalar(end, pa.timestamp("s", "UTC")))
+            mask = before if mask is None else pc.and_(mask, before)
+        if mask is not None:
+            table = table.filter(mask)
+
+        sort_keys = [("location", "ascending"), (time_columns[kind], "ascending")]
+        if kind == "forecast" and "valid_at" in table.column_names:
+            sort_keys.append(("valid_at", "ascending"))
+        table = table.sort_by(sort_keys)
+
+        if kind == "current" and table.num_rows:
+            table = _drop_repeats(table)
+
+        if as_frame:
+            return table.to_pandas()
+        return {name: table[name].to_numpy() for name in table.column_names}
+
+    def _chunk_files(self, kind, location, start, end):
+        """ Chunk files of the partitions that can hold rows in [start, end) """
+        locations = self.locations(kind) if location is None else \
+            [location] if isinstance(location, str) else list(location)
+        first = None if start is None else _day(start)
+        last = None if end is None else _day(end)
+
+        files = []
+        for name in locations:
+            directory = os.path.join(self.path, kind, f"location={name}")
+            if not os.path.isdir(directory):
+                continue
+            for day_dir in sorted(os.listdir(directory)):
+                day = day_dir.split("=", 1)[-1]
+                if (first is not None and day < first) or (last is not None and day > last):
+                    continue
+                day_path = os.path.join(directory, day_dir)
+                files.extend(os.path.join(day_path, f) for f in sorted(os.listdir(day_path))
+                             if f.endswith(".parquet") and not f.startswith("."))
+        return files
+
+    def compact(self, before=None):
+        """ Merge the chunk files of every partition older than the before day (default: today, UTC)
+        into one file per partition, keeping the file count small for long running collectors.
+        Returns:
+            number of partitions compacted
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        before = before or _day(time.time())
+        compacted = 0
+        for kind in kinds:
+            for location in self.locations(kind):
+                directory = os.path.join(self.path, kind, f"location={location}")
+                for day_dir in os.listdir(directory):
+                    day = day_dir.split("=", 1)[-1]
+                    if day >= before:
+                        continue
+                    day_path = os.path.join(directory, day_dir)
+                    chunks = sorted(f for f in os.listdir(day_path) if f.endswith(".parquet")
+                                    and not f.startswith("."))
+                    if len(chunks) < 2:
+                        continue
+
+                    table = pa.concat_tables([pq.read_table(os.path.join(day_path, f), schema=_schema(kind))
+                                              for f in chunks])
+                    table = table.sort_by(time_columns[kind])
+                    self._write_table(day_path, chunks, table)
+                    compacted += 1
+        return compacted
+
+    def _write_table(self, day_path, replaced, table):
+        import pyarrow.parquet as pq
+
+        name = f"chunk-{time.time_ns()}-{os.getpid()}-compacted.parquet"
+        temporary = os.path.join(day_path, "." + name)
+        pq.write_table(table, temporary)
+        os.replace(temporary, os.path.join(day_path, name))
+        for f in replaced:
+            os.remove(os.path.join(day_path, f))
+
+    def stats(self):
+        return {"queued": self._queue.qsize(), "written": self.written, "dropped": self.dropped,
+                "failed": self.failed}
+
+
+def location_id(city=None, lat=None, lon=None):
+    """ Storage id of a location, the same one weather_api caches it under.
+    Known city names map to their (rounded) coordinates, so "Paris" and its lat/lon share history.
+    """
+    params = _current_params(city, lat, lon)
+    if params is None:
+        raise ValueError("No location provided. Please enter a city or latitude & longitude.")
+    _, key = _resolve_location("weather", params)
+    if key is None:
+        raise ValueError(f"Unknown city: {city}")
+    return _key_location(key)
+
+
+def _key_location(key):
+    """ ("weather", "coord", 28.61, 77.23, "metric") -> "coord_28.61_77.23", city keys -> "city_<name>" """
+    if key[1] == "coord":
+        return f"coord_{key[2]}_{key[3]}"
+    name = "".join(ch if ch.isalnum() or ch in "-." else "_" for ch in str(key[2]))
+    return f"city_{name}"
+
+
+def _observation_rows(key, data, fetched_at):
+    tz = timezone(timedelta(seconds=data.get("timezone") or 0))
+    observed_at = _parse_local(data.get("date_time"), tz)
+    if observed_at is None:
+        return []
+
+    row = {"location": _key_location(key), "observed_at": observed_at, "fetched_at": int(fetched_at),
+           "city": data.get("city"), "country": data.get("country"), "lat": data.get("lat"),
+           "lon": data.get("long"), "description": data.get("weather_description")}
+    for name in _numbers:
+        row[name] = _float(data.get(name))
+    return [row]
+
+
+def _forecast_rows(key, data, fetched_at):
+    """ One row per forecast slot, from the list of dicts or the columnar DataFrame result """
+    location = _key_location(key)
+    issued_at = int(fetched_at)
+    forecast = data.get("forecast")
+
+    if hasattr(forecast, "columns"):
+        # columnar result, the date column is tz-aware already
+        slots = forecast.to_dict("records")
+        for slot in slots:
+            slot["valid_at"] = int(slot["date"].timestamp())
+    else:
+        tz = timezone(timedelta(seconds=data.get("city", {}).get("timezone") or 0))
+        slots = [dict(slot, valid_at=_parse_local(slot.get("date"), tz)) for slot in forecast or []]
+
+    rows = []
+    for slot in slots:
+        if slot["valid_at"] is None:
+            continue
+        row = {"location": location, "issued_at": issued_at, "valid_at": slot["valid_at"],
+               "lead": slot["valid_at"] - issued_at, "description": slot.get("weather_description")}
+        for name in _numbers:
+            row[name] = _float(slot.get(name))
+        rows.append(row)
+    return rows
+
+
+def _schema(kind):
+    import pyarrow as pa
+
+    stamp = pa.timestamp("s", "UTC")
+    numbers = [(name, pa.float64()) for name in _numbers]
+    if kind == "current":
+        return pa.schema([("location", pa.string()), ("observed_at", stamp), ("fetched_at", stamp),
+                          ("city", pa.string()), ("country", pa.string()), ("lat", pa.float64()),
+                          ("lon", pa.float64()), ("description", pa.string())] + numbers)
+    return pa.schema([("location", pa.string()), ("issued_at", stamp), ("valid_at", stamp),
+                      ("lead", pa.int64()), ("description", pa.string())] + numbers)
+
+
+def _drop_repeats(table):
+    """ Keep one row per (location, observed_at): a refresh before the API's next update returns the same observation """
+    import numpy as np
+
+    locations = table["location"].to_numpy(zero_copy_only=False)
+    moments = table["observed_at"].cast("int64").to_numpy()
+    repeated = np.zeros(len(moments), dtype=bool)
+    repeated[1:] = (locations[1:] == locations[:-1]) & (moments[1:] == moments[:-1])
+    return table.filter(~repeated)
+
+
+def _parse_local(text, tz):
+    """ weather_api local time string -> epoch seconds """
+    if not text:
+        return None
+    try:
+        return int(datetime.strptime(text, time_format).replace(tzinfo=tz).timestamp())
+    except ValueError:
+        return None
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_epoch(moment):
+    if moment is None or isinstance(moment, (int, float)):
+        return moment
+    if getattr(moment, "tzinfo", None) is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def _day(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%d")
@@ -0,0 +1,167 @@
+""" Decoding of raw API response bodies with the fastest JSON library installed.
+
+msgspec decodes straight into dicts that only hold the fields the parsers in weather_api read,
+skipping the rest of the payload while decoding; orjson and ujson decode everything, but in C and
+from the raw bytes; the standard json module is the fallback. The weather_json env var forces one
+of "msgspec", "orjson", "ujson" or "json".
+
+    data = weather_json.decode(response.content, "forecast")
+"""
+import json
+import os
+
+# preferred order, the first one installed is used
+backends = ("msgspec", "orjson", "ujson", "json")
+
+_backend = None
+_loads = None
+_decoders = None
+
+
+def backend():
+    """ Name of the JSON library in use (chosen on first use) """
+    if _backend is None:
+        _select(os.getenv("weather_json"))
+    return _backend
+
+
+def use(name=None):
+    """ Switch to the JSON library name, or back to the fastest installed one when None.
+    Raises:
+        ImportError: name is not installed
+    """
+    _select(name, strict=name is not None)
+    return _backend
+
+
+def decode(body, kind=None):
+    """ Decode a response body.
+    Args:
+        body (bytes or str): raw response body
+        kind (str): endpoint the body came from ("weather", "forecast" or "group"), with msgspec only the
+                    fields the parsers need are decoded; anything else decodes the whole document
+    Returns:
+        the decoded document (dicts and lists)
+    """
+    if _backend is None:
+        backend()
+
+    decoder = _decoders.get(kind) if _decoders is not None else None
+    if decoder is not None:
+        try:
+            return decoder.decode(body)
+        except _validation_error:
+            # a field of an unexpected type (e.g. "main": null), decode everything and let the parser cope
+            pass
+    return _loads(body)
+
+
+def _select(name=None, strict=False):
+    global _backend, _loads, _decoders
+    for candidate in ([name] if name else backends):
+        try:
+            loads, decoders = _load(candidate)
+        except ImportError:
+            if strict:
+                raise
+            continue
+        _backend, _loads, _decoders = candidate, loads, decoders
+        return
+    _backend, _loads, _decoders = "json", json.loads, None
+
+
+class _NoError(Exception):
+    pass
+
+
+_validation_error = _NoError
+
+
+def _load(name):
+    """ (loads function, {kind: selective decoder} or None) of one library """
+    global _validation_error
+    if name == "msgspec":
+        import msgspec
+
+        _validation_error = msgspec.ValidationError
+        return msgspec.json.decode, _msgspec_decoders(msgspec)
+    if name == "orjson":
+        import orjson
+        return orjson.loads, None
+    if name == "ujson":
+        import ujson
+        return ujson.loads, None
+    if name == "json":
+        return json.loads, None
+    raise ImportError(f"Unknown JSON library {name}")
+
+
+def _msgspec_decoders(msgspec):
+    """ Typed decoders reading only what _filter_current_data / filter_forecast_data(columns) use """
+    from typing import Any, List, TypedDict
+
+    class Coord(TypedDict, total=False):
+        lat: Any
+        lon: Any
+
+    class Main(TypedDict, total=False):
+        temp: Any
+        feels_like: Any
+        pressure: Any
+        humidity: Any
+
+    class Weather(TypedDict, total=False):
+        description: Any
+        icon: Any
+
+    class Wind(TypedDict, total=False):
+        speed: Any
+        deg: Any
+
+    class Clouds(TypedDict, total=False):
+        all: Any
+
+    class Sys(TypedDict, total=False):
+        country: Any
+        timezone: Any
+        sunrise: Any
+        sunset: Any
+
+    class Current(TypedDict, total=False):
+        id: Any
+        name: Any
+        dt: Any
+        timezone: Any
+        visibility: Any
+        coord: Coord
+        main: Main
+        weather: List[Weather]
+        wind: Wind
+        sys: Sys
+
+    class Group(TypedDict, total=False):
+        list: List[Current]
+
+    class City(TypedDict, total=False):
+        name: Any
+        country: Any
+        timezone: Any
+        sunrise: Any
+        sunset: Any
+        coord: Coord
+
+    class Slot(TypedDict, total=False):
+        dt: Any
+        visibility: Any
+        pop: Any
+        main: Main
+        weather: List[Weather]
+        wind: Wind
+        clouds: Clouds
+
+    class Forecast(TypedDict, total=False):
+        city: City
+        list: List[Slot]
+
+    return {"weather": msgspec.json.Decoder(Current), "group": msgspec.json.Decoder(Group),
+            "forecast": msgspec.json.Decoder(Forecast)}
@@ -0,0 +1,263 @@
+""" Lightweight instrumentation of the request path: named spans, counters and latency histograms.
+
+Disabled by default, then every call is a flag check (span() hands out a shared no-op context
+manager). Enable it with the weather_metrics env var or enable(), then read it with snapshot()
+(Streamlit debug panel), prometheus_text(), serve() (a /metrics endpoint) or write_file().
+
+    with weather_metrics.span("parse_forecast"):
+        ...
+    weather_metrics.inc("weather_errors_total", endpoint="weather", error="Timeout")
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+enabled = bool(os.getenv("weather_metrics"))
+
+# histogram bucket upper bounds in seconds
+default_buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# raw samples kept per histogram for exact recent percentiles in snapshot()
+recent_samples = 1024
+
+_help = {
+    "weather_stage_seconds": ("histogram", "Time spent per stage of a lookup"),
+    "weather_request_seconds": ("histogram", "Upstream HTTP request time per endpoint (connect + response)"),
+    "weather_responses_total": ("counter", "Upstream responses by endpoint and HTTP status"),
+    "weather_errors_total": ("counter", "Failed upstream requests by endpoint and exception class"),
+    "weather_retries_total": ("counter", "Upstream retries by endpoint (urllib3 retries and 429 waits)"),
+    "weather_stale_total": ("counter", "Expired results served while refreshing or while the API is unavailable"),
+}
+
+
+class Histogram:
+    """ Cumulative bucket counts plus a window of recent raw samples """
+
+    __slots__ = ("buckets", "counts", "count", "sum", "recent")
+
+    def __init__(self, buckets=default_buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=recent_samples)
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def percentile(self, q):
+        """ q-th percentile of the recent samples, None without samples """
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> Histogram
+_lock = threading.Lock()
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def inc(name, amount=1, **labels):
+    """ Add amount to the counter name{labels} """
+    if not enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, seconds, **labels):
+    """ Record one duration in the histogram name{labels} """
+    if not enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+
+class _Span:
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe("weather_stage_seconds", time.perf_counter() - self.started, stage=self.stage)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_no_span = _NoSpan()
+
+
+def span(stage):
+    """ Context manager timing a stage into weather_stage_seconds{stage} (a no-op while disabled) """
+    return _Span(stage) if enabled else _no_span
+
+
+def snapshot():
+    """ Current values as plain data: {"counters": [...], "histograms": [...], "cache": {...}} """
+    with _lock:
+        counters = [{"name": name, **dict(labels), "value": value} for (name, labels), value in _counters.items()]
+        histograms = [{"name": name, **dict(labels), "count": h.count,
+                       "mean_ms": h.sum / h.count * 1000 if h.count else None,
+                       "p50_ms": _ms(h.percentile(50)), "p99_ms": _ms(h.percentile(99))}
+                      for (name, labels), h in _histograms.items()]
+    return {"counters": sorted(counters, key=_sort_key), "histograms": sorted(histograms, key=_sort_key),
+            "cache": _cache_stats()}
+
+
+def prometheus_text():
+    """ Every metric in the Prometheus text exposition format """
+    lines = []
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, (h.buckets, list(h.counts), h.count, h.sum)) for key, h in _histograms.items())
+
+    described = set()
+
+    def describe(name, kind=None, text=None):
+        if name not in described:
+            described.add(name)
+            kind, text = _help.get(name, (kind, text))
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in counters:
+        describe(name, "counter", name)
+        lines.append(f"{name}{_labels(labels)} {value}")
+
+    for (name, labels), (buckets, counts, count, total) in histograms:
+        describe(name, "histogram", name)
+        cumulative = 0
+        for bound, bucket_count in zip(buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {total}")
+        lines.append(f"{name}_count{_labels(labels)} {count}")
+
+    # cache counters are kept by weather_api itself, read them at export time
+    for field, value in sorted(_cache_stats().items()):
+        if isinstance(value, (int, float)):
+            describe(f"weather_cache_{field}", "gauge", f"weather_api response cache {field}")
+            lines.append(f"weather_cache_{field} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+def write_file(path):
+    """ Write prometheus_text() to path atomically (e.g. for node_exporter's textfile collector) """
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(temporary, path)
+
+
+def serve(port=9464, host="127.0.0.1"):
+    """ Serve prometheus_text() on http://host:port/metrics from a daemon thread, returns the server """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = prometheus_text().encode()
+            self.send_response(200 if self.path.startswith("/metrics") else 404)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="weather-metrics", daemon=True).start()
+    return server
+
+
+def start_file_export(path, interval=15.0):
+    """ Rewrite path with the current metrics every interval seconds from a daemon thread """
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                write_file(path)
+            except OSError:
+                pass
+
+    thread = threading.Thread(target=run, name="weather-metrics-file", daemon=True)
+    thread.start()
+    return thread
+
+
+def _cache_stats():
+    import sys
+
+    # only report the cache when weather_api is in use, never import it from here
+    weather_api = sys.modules.get("weather_api")
+    if weather_api is None:
+        return {}
+    stats = weather_api.cache_stats()
+    stats.pop("disk", None)
+    return stats
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for key, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _ms(seconds):
+    return None if seconds is None else seconds * 1000
+
+
+def _sort_key(item):
+    return tuple(str(value) for value in item.values())
+
+
+if enabled and os.getenv("weather_metrics_port"):
+    serve(int(os.getenv("weather_metrics_port")))
+
+if enabled and os.getenv("weather_metrics_file"):
+    start_file_export(os.getenv("weather_metrics_file"))
@@ -0,0 +1,204 @@
+""" Pipeline for bulk forecast jobs over many thousands of locations.
+
+Three stages: I/O threads fetch the raw response bodies, a process pool decodes and parses them
+in chunks (filter_forecast_data is pure Python and holds the GIL, so once the requests run
+concurrently parsing on threads stops scaling) and the results stream back to the caller, who
+writes them. The stages hand over through a bounded queue and a bounded window of chunks, so
+a slow writer holds back parsing and a slow parser holds back fetching.
+
+    for index, result in iter_forecasts(locations, parse_workers=8):
+        writer.write(index, result)
+"""
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import weather_json
+from weather_api import (CircuitOpen, RateLimited, _bulk_fetch, _cache_get, _cache_set, _forecast_failed,
+                         _forecast_params, _forecast_response, _no_location, _resolve_location, _unknown_city,
+                         filter_forecast_columns, filter_forecast_data, forecast_ttl)
+
+# responses per chunk sent to a parser process, large enough to amortize the hand-over
+default_chunk_size = 16
+
+# a partial chunk is sent off after the input paused this long
+flush_interval = 0.05
+
+_done = object()
+
+
+def iter_forecasts(locations, io_workers=None, parse_workers=None, chunk_size=default_chunk_size, columnar=False,
+                   cache=True, fetch=None):
+    """ Streaming bulk forecast lookup with the parsing spread over processes.
+    Args:
+        locations (iterable): city names and/or (lat, lon) tuples, can be a lazy iterable of any size
+        io_workers (int): concurrent requests (defaults to weather_api.bulk_workers)
+        parse_workers (int): parser processes, defaults to the number of CPUs; 0 parses in this process
+        chunk_size (int): responses handed to a parser process at once
+        columnar (bool): parse with filter_forecast_columns, as get_forecast_data(columnar=True)
+        cache (bool): serve cached results and cache the parsed ones, like get_forecast_data
+        fetch (callable): fetch(location) -> raw body, replaces the HTTP request (e.g. recorded payloads)
+    Yields:
+        tuple: (index, result) in completion order, results have the get_forecast_data shape
+    """
+
+    parse_workers = (os.cpu_count() or 1) if parse_workers is None else parse_workers
+    window = max(1, parse_workers) * 2
+    raw = queue.Queue(maxsize=chunk_size * window)
+    stop = threading.Event()
+
+    def fetch_one(location):
+        try:
+            return _fetch_raw(location, columnar, cache, fetch)
+        except Exception as e:
+            return "result", None, {"success": False, "error": f"Unexpected error: {e}", "data": None}
+
+    def feed():
+        try:
+            for entry in _bulk_fetch(fetch_one, locations, io_workers):
+                if not _put(raw, entry, stop):
+                    return
+        finally:
+            _put(raw, _done, stop)
+
+    pool = ProcessPoolExecutor(parse_workers, mp_context=_context()) if parse_workers else None
+    feeder = threading.Thread(target=feed, name="weather-pipeline-io", daemon=True)
+    feeder.start()
+
+    keys = {}        # index -> cache key of every response being parsed
+    pending = set()  # futures of the chunks being parsed
+    chunk = []
+    finished = False
+    try:
+        while True:
+            entry = None
+            if not finished:
+                try:
+                    entry = raw.get(timeout=flush_interval if chunk or pending else None)
+                except queue.Empty:
+                    pass
+
+            if entry is _done:
+                finished = True
+            elif entry is not None:
+                index, (kind, key, value) = entry
+                if kind == "result":
+                    yield index, value
+                else:
+                    keys[index] = key
+                    chunk.append((index, value))
+
+            # a full chunk, or whatever arrived before the input paused or ended
+            if chunk and (len(chunk) >= chunk_size or entry is None or finished):
+                if pool is None:
+                    yield from _finish(_parse_chunk(chunk, columnar), keys, cache)
+                else:
+                    pending.add(pool.submit(_parse_chunk, chunk, columnar))
+                chunk = []
+
+            if pending:
+                # only block on the parsers when the window is full or nothing else is left to do
+                block = len(pending) >= window or finished
+                done, _ = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.discard(future)
+                    yield from _finish(future.result(), keys, cache)
+            elif finished and not chunk:
+                break
+
+    finally:
+        # the caller may stop early: release the feeder and drop queued work
+        stop.set()
+        while feeder.is_alive():
+            try:
+                raw.get(timeout=flush_interval)
+            except queue.Empty:
+                pass
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+def get_forecasts(locations, io_workers=None, parse_workers=None, chunk_size=default_chunk_size, columnar=False,
+                  cache=True):
+    """ iter_forecasts collected into a list in input order """
+    results = []
+    for index, result in iter_forecasts(locations, io_workers, parse_workers, chunk_size, columnar, cache):
+        if index >= len(results):
+            results.extend([None] * (index + 1 - len(results)))
+        results[index] = result
+    return results
+
+
+def _fetch_raw(location, columnar, cache, fetch):
+    """ I/O stage for one location.
+    Returns:
+        ("raw", cache key, body bytes) to be parsed, or ("result", None, result) when there is nothing to parse
+        (cached, unknown location or failed request)
+    """
+    if isinstance(location, (tuple, list)):
+        params = _forecast_params(None, *location)
+    else:
+        params = _forecast_params(location, None, None)
+    if params is None:
+        return "result", None, _no_location()
+
+    params, key = _resolve_location("forecast", params)
+    if key is None:
+        return "result", None, _unknown_city()
+    if columnar:
+        key += ("columns",)
+
+    if cache:
+        cached = _cache_get(key)
+        if cached is not None:
+            return "result", None, cached
+
+    if fetch is not None:
+        return "raw", key, fetch(location)
+
+    import requests
+
+    try:
+        return "raw", key, _forecast_response(params).content
+    except (RateLimited, CircuitOpen, requests.exceptions.RequestException) as e:
+        return "result", None, _forecast_failed(key, e)
+
+
+def _parse_chunk(chunk, columnar=False):
+    """ Parser stage, runs in the pool processes: decode and parse (index, body) pairs """
+    results = []
+    for index, body in chunk:
+        try:
+            data = weather_json.decode(body, "forecast")
+            parsed = filter_forecast_columns(data) if columnar else filter_forecast_data(data)
+            results.append((index, {"success": True, "data": parsed, "error": None}))
+        except Exception as e:
+            results.append((index, {"success": False, "error": f"Unexpected error: {e}", "data": None}))
+    return results
+
+
+def _finish(results, keys, cache):
+    for index, result in results:
+        key = keys.pop(index)
+        if cache and result["success"]:
+            _cache_set(key, result, forecast_ttl)
+        yield index, result
+
+
+def _put(q, item, stop):
+    """ Blocking put that gives up once stop is set, returns whether the item was queued """
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=flush_interval)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _context():
+    # forking a process with running I/O threads can copy held locks, start parsers from a clean process
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
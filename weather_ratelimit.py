@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+class TokenBucket:
+    """ In-process token bucket allowing requests_per_minute calls, with bursts up to burst """
+
+    def __init__(self, requests_per_minute=60, burst=None):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = burst or max(1, requests_per_minute // 6)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait_time(self):
+        """ Take a token if one is available and return 0, otherwise return how long to wait """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """ Token bucket limiter plus per-minute / per-day quota counters for one API key.
+    Args:
+        requests_per_minute (int): sustained request rate
+        requests_per_day (int): optional daily quota, requests beyond it are refused until the next UTC day
+        path (str): SQLite file to share the bucket and counters between processes (in-process when None)
+        burst (int): bucket size, defaults to 1/6 of the per minute rate
+    """
+
+    def __init__(self, requests_per_minute=60, requests_per_day=None, path=None, burst=None):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = burst or max(1, requests_per_minute // 6)
+        self.requests_per_day = requests_per_day
+        self.path = path
+        self.throttled = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._memory = {}
+        self._local = threading.local()
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._connect().execute("CREATE TABLE IF NOT EXISTS limiter (name TEXT PRIMARY KEY, value REAL)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            import sqlite3
+
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA busy_timeout = 30000")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _state(self):
+        """ Exclusive read-modify-write access to the limiter state, across threads and processes """
+        if not self.path:
+            with self._lock:
+                yield self._memory
+            return
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            state = dict(conn.execute("SELECT name, value FROM limiter").fetchall())
+            before = dict(state)
+            yield state
+            for name in before.keys() - state.keys():
+                conn.execute("DELETE FROM limiter WHERE name = ?", (name,))
+            conn.executemany("INSERT OR REPLACE INTO limiter (name, value) VALUES (?, ?)",
+                             [(name, value) for name, value in state.items() if before.get(name) != value])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _try_acquire(self):
+        """ Take one request from the budget. Returns 0 on success, else seconds to wait (None = over daily quota) """
+        now = time.time()
+        minute, day = _periods(now)
+
+        with self._state() as state:
+            blocked_until = state.get("blocked_until", 0)
+            if blocked_until > now:
+                return blocked_until - now
+
+            if self.requests_per_day is not None and state.get(day, 0) >= self.requests_per_day:
+                return None
+
+            tokens = state.get("tokens", self.capacity)
+            tokens = min(self.capacity, tokens + (now - state.get("updated", now)) * self.rate)
+            state["updated"] = now
+            if tokens < 1:
+                state["tokens"] = tokens
+                return (1 - tokens) / self.rate
+
+            state["tokens"] = tokens - 1
+            # keep only the current minute/day counters
+            for name in [name for name in state if name[:2] in ("m:", "d:") and name not in (minute, day)]:
+                del state[name]
+            state[minute] = state.get(minute, 0) + 1
+            state[day] = state.get(day, 0) + 1
+            return 0
+
+    def acquire(self, timeout=None):
+        """ Wait (queue) up to timeout seconds for budget.
+        Returns:
+            True when the request may go out, False when no budget frees up in time
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waited = False
+        while True:
+            wait = self._try_acquire()
+            if wait == 0:
+                if waited:
+                    self.throttled += 1
+                return True
+
+            left = None if deadline is None else deadline - time.monotonic()
+            if wait is None or (left is not None and wait > left):
+                self.rejected += 1
+                return False
+
+            waited = True
+            time.sleep(wait)
+
+    def block_for(self, seconds):
+        """ Stop all requests (in every process sharing the limiter) for seconds, e.g. after a 429 """
+        until = time.time() + seconds
+        with self._state() as state:
+            state["blocked_until"] = max(state.get("blocked_until", 0), until)
+
+    def stats(self):
+        """ Quota counters of the current minute and day, plus how many callers waited or were refused """
+        now = time.time()
+        minute, day = _periods(now)
+        with self._state() as state:
+            return {"minute": int(state.get(minute, 0)), "day": int(state.get(day, 0)),
+                    "blocked_for": max(0.0, state.get("blocked_until", 0) - now),
+                    "throttled": self.throttled, "rejected": self.rejected}
+
+
+def _periods(now):
+    stamp = datetime.fromtimestamp(now, timezone.utc)
+    return "m:" + stamp.strftime("%Y-%m-%dT%H:%M"), "d:" + stamp.strftime("%Y-%m-%d")
@@ -0,0 +1,130 @@
+import sys
+from typing import NamedTuple
+
+from weather_api import _filter_current_data, filter_forecast_data
+
+
+class CurrentObservation(NamedTuple):
+    """ Compact, immutable form of one _filter_current_data result (same field names) """
+    city: str
+    date_time: str
+    temperature: float
+    feels_like: float
+    weather_description: str
+    weather_icon: str
+    pressure: int
+    humidity: int
+    visibility: int
+    wind_speed: float
+    sunrise: str
+    sunset: str
+    long: float
+    lat: float
+    timezone: int
+    country: str
+
+    @classmethod
+    def from_dict(cls, data):
+        """ Build from the dictionary returned by _filter_current_data / get_current_data()["data"] """
+        values = dict(data)
+        values["weather_description"] = _intern(values.get("weather_description"))
+        values["weather_icon"] = _intern(values.get("weather_icon"))
+        values["country"] = _intern(values.get("country"))
+        return cls(**{field: values.get(field) for field in cls._fields})
+
+    def to_dict(self):
+        """ Same dictionary as _filter_current_data """
+        return dict(zip(self._fields, self))
+
+
+class CityInfo(NamedTuple):
+    """ Location metadata of a forecast, shared by all of its slots """
+    city: str
+    latitude: float
+    longitude: float
+    country: str
+    timezone: int
+    sunrise: str
+    sunset: str
+
+    def to_dict(self):
+        """ Same dictionary as filter_forecast_data()["city"] """
+        return {"city": self.city, "latitude": self.latitude, "longitude": self.longitude,
+                "country": self.country, "timezone": self.timezone}
+
+
+class ForecastSlot(NamedTuple):
+    """ One 3-hour forecast entry, sunrise/sunset live on the shared city record """
+    date: str
+    temperature: float
+    feels_like: float
+    weather_description: str
+    weather_icon: str
+    pressure: int
+    humidity: int
+    visibility: int
+    wind_speed: float
+    city: CityInfo
+
+    @property
+    def sunrise(self):
+        return self.city.sunrise
+
+    @property
+    def sunset(self):
+        return self.city.sunset
+
+    def to_dict(self):
+        """ Same dictionary as one entry of filter_forecast_data()["forecast"] """
+        return {"date": self.date,
+                "temperature": self.temperature,
+                "feels_like": self.feels_like,
+                "weather_description": self.weather_description,
+                "weather_icon": self.weather_icon,
+                "pressure": self.pressure,
+                "humidity": self.humidity,
+                "visibility": self.visibility,
+                "wind_speed": self.wind_speed,
+                "sunrise": self.city.sunrise,
+                "sunset": self.city.sunset}
+
+
+class Forecast(NamedTuple):
+    """ A parsed forecast: one CityInfo and a tuple of ForecastSlot records pointing at it """
+    city: CityInfo
+    slots: tuple
+
+    @classmethod
+    def from_dict(cls, data):
+        """ Build from the dictionary returned by filter_forecast_data / get_forecast_data()["data"] """
+        entries = data.get("forecast", [])
+        first = entries[0] if entries else {}
+        info = data.get("city", {})
+        city = CityInfo(info.get("city"), info.get("latitude"), info.get("longitude"), _intern(info.get("country")),
+                        info.get("timezone"), first.get("sunrise"), first.get("sunset"))
+
+        slots = tuple(ForecastSlot(entry.get("date"), entry.get("temperature"), entry.get("feels_like"),
+                                   _intern(entry.get("weather_description")), _intern(entry.get("weather_icon")),
+                                   entry.get("pressure"), entry.get("humidity"), entry.get("visibility"),
+                                   entry.get("wind_speed"), city)
+                      for entry in entries)
+        return cls(city, slots)
+
+    def to_dict(self):
+        """ Same dictionary as filter_forecast_data """
+        return {"city": self.city.to_dict(), "forecast": [slot.to_dict() for slot in self.slots]}
+
+
+def parse_current(data):
+    """ Parse a raw /weather JSON response into a CurrentObservation """
+    return CurrentObservation.from_dict(_filter_current_data(data))
+
+
+def parse_forecast(data):
+    """ Parse a raw /forecast JSON response into a Forecast of shared-city slots """
+    return Forecast.from_dict(filter_forecast_data(data))
+
+
+def _intern(value):
+    # descriptions, icons and country codes come from a tiny vocabulary, keep one copy of each
+    return sys.intern(value) if isinstance(value, str) else value
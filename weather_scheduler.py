@@ -0,0 +1,187 @@
+""" Refresh-ahead prefetching for a watch-list of locations.
+
+Keeps the weather_api cache warm for the locations we care about, so a user click never pays
+for a cold fetch. Run it standalone (python weather_scheduler.py watchlist.txt) together with the
+disk cache, or inside the Streamlit server with start_scheduler().
+"""
+import argparse
+import heapq
+import json
+import random
+import threading
+import time
+
+import weather_api
+from weather_api import parse_location
+from weather_ratelimit import TokenBucket
+
+
+class PrefetchScheduler:
+    """ Refreshes every watched location shortly before its cache entry expires.
+    Args:
+        locations (list): city names and/or (lat, lon) tuples
+        endpoints (tuple): "weather" and/or "forecast"
+        refresh_ahead (float): refresh this many seconds before the cache TTL runs out
+        jitter (float): spread each refresh randomly over this many extra seconds earlier, so a
+                        watch-list loaded at once doesn't refresh at once
+        requests_per_minute (int): global upstream budget of the scheduler
+    """
+
+    def __init__(self, locations, endpoints=("weather", "forecast"), refresh_ahead=60, jitter=60,
+                 requests_per_minute=50):
+        self.locations = list(locations)
+        self.endpoints = tuple(endpoints)
+        self.refresh_ahead = refresh_ahead
+        self.jitter = jitter
+        self.budget = TokenBucket(requests_per_minute)
+        self.refreshes = 0
+        self.failures = 0
+        self._last_success = {}  # (position, endpoint) -> time of the last good refresh
+        self._lags = []
+        self._queue = []
+        self._stop = threading.Event()
+        self._thread = None
+
+        # first round: spread the whole watch-list over the jitter window
+        now = time.time()
+        for position in range(len(self.locations)):
+            for endpoint in self.endpoints:
+                heapq.heappush(self._queue, (now + random.uniform(0, self.jitter), position, endpoint))
+
+    def _ttl(self, endpoint):
+        return weather_api.current_ttl if endpoint == "weather" else weather_api.forecast_ttl
+
+    def _fetch(self, location, endpoint):
+        if isinstance(location, (tuple, list)):
+            city, lat, lon = None, location[0], location[1]
+        else:
+            city, lat, lon = location, None, None
+        if endpoint == "weather":
+            return weather_api.get_current_data(city, lat, lon, refresh=True)
+        # the apps (weather_gui_1, main_cmd) read forecasts in the columnar form, warm that cache entry
+        return weather_api.get_forecast_data(city, lat, lon, columnar=True, refresh=True)
+
+    def run_once(self):
+        """ Refresh the next due location, waiting for its due time and for budget.
+        Returns:
+            False when the scheduler was stopped
+        """
+        due, position, endpoint = self._queue[0]
+        if self._stop.wait(max(0.0, due - time.time())):
+            return False
+
+        wait = self.budget.wait_time()
+        while wait:
+            if self._stop.wait(wait):
+                return False
+            wait = self.budget.wait_time()
+
+        heapq.heappop(self._queue)
+        started = time.time()
+        self._lags.append(started - due)
+        del self._lags[:-1000]
+
+        try:
+            result = self._fetch(self.locations[position], endpoint)
+        except Exception as e:
+            # one bad response must not end the refresh thread
+            result = {"success": False, "error": f"Unexpected error: {e}", "data": None}
+        self.refreshes += 1
+        ttl = self._ttl(endpoint)
+        # a stale result is the old entry handed back while rate limited or unavailable, the refresh failed
+        if result["success"] and not result.get("stale"):
+            self._last_success[(position, endpoint)] = started
+            next_due = started + max(1.0, ttl - self.refresh_ahead - random.uniform(0, self.jitter))
+        else:
+            self.failures += 1
+            # retry a failed location well before its (possibly stale) entry matters again
+            next_due = started + min(ttl / 4, 60) + random.uniform(0, self.jitter)
+
+        heapq.heappush(self._queue, (next_due, position, endpoint))
+        return True
+
+    def run(self):
+        """ Refresh until stop() is called """
+        while self._queue and self.run_once():
+            pass
+
+    def start(self):
+        """ Run in a daemon thread (e.g. inside the Streamlit server) """
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name="weather-prefetch", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def metrics(self):
+        """ Refresh counters, staleness (age of the oldest good refresh) and refresh lag (late start) in seconds """
+        now = time.time()
+        ages = [now - self._last_success[slot] if slot in self._last_success else None
+                for slot in ((p, e) for p in range(len(self.locations)) for e in self.endpoints)]
+        known = [age for age in ages if age is not None]
+        lags = sorted(self._lags)
+
+        return {
+            "watched": len(ages),
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "never_refreshed": ages.count(None),
+            "max_staleness": max(known) if known else None,
+            "mean_staleness": sum(known) / len(known) if known else None,
+            "refresh_lag_p50": lags[len(lags) // 2] if lags else None,
+            "refresh_lag_max": lags[-1] if lags else None,
+            "next_due_in": self._queue[0][0] - now if self._queue else None,
+        }
+
+
+def read_watch_list(path):
+    with open(path, encoding="utf-8") as f:
+        return [parse_location(line) for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def start_scheduler(locations, **options):
+    """ Start the process wide scheduler once (safe to call on every Streamlit rerun) and return it """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = PrefetchScheduler(locations, **options).start()
+    return _scheduler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep the weather cache warm for a watch-list of locations.")
+    parser.add_argument("watch_list", help="file with one city name or 'lat, lon' per line")
+    parser.add_argument("--rpm", type=int, default=50, help="upstream requests per minute (default 50)")
+    parser.add_argument("--refresh-ahead", type=float, default=60, help="seconds before TTL expiry to refresh")
+    parser.add_argument("--jitter", type=float, default=60, help="random spread of refreshes in seconds")
+    parser.add_argument("--current-only", action="store_true", help="don't prefetch forecasts")
+    parser.add_argument("--cache-path", help="disk cache shared with the apps (default: weather_cache_path env var)")
+    parser.add_argument("--metrics-every", type=float, default=60, help="print metrics every N seconds")
+    args = parser.parse_args()
+
+    # a separate process only helps the apps through the shared disk cache
+    if args.cache_path or weather_api.disk_cache is None:
+        weather_api.enable_disk_cache(args.cache_path)
+
+    endpoints = ("weather",) if args.current_only else ("weather", "forecast")
+    scheduler = PrefetchScheduler(read_watch_list(args.watch_list), endpoints=endpoints, jitter=args.jitter,
+                                  refresh_ahead=args.refresh_ahead, requests_per_minute=args.rpm).start()
+    try:
+        while True:
+            time.sleep(args.metrics_every)
+            print(json.dumps(scheduler.metrics()), flush=True)
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
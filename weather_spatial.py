@@ -0,0 +1,83 @@
+import math
+import threading
+
+km_per_degree = 111.32
+earth_radius_km = 6371.0
+
+
+class GridIndex:
+    """ Quantized lat/lon grid used to find the nearest known point around a coordinate.
+    Args:
+        cell_km (float): cell size in km (north-south), the resolution of snap() and of the neighbour search
+    """
+
+    def __init__(self, cell_km=1.0):
+        self.cell_km = cell_km
+        self.cell_deg = cell_km / km_per_degree
+        self._cells = {}  # (row, col) -> {key: (lat, lon)}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def cell(self, lat, lon):
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def snap(self, lat, lon):
+        """ Canonical coordinate for everything inside the same cell (the cell centre) """
+        row, col = self.cell(lat, lon)
+        return round((row + 0.5) * self.cell_deg, 6), round((col + 0.5) * self.cell_deg, 6)
+
+    def add(self, lat, lon, key):
+        with self._lock:
+            points = self._cells.setdefault(self.cell(lat, lon), {})
+            if key not in points:
+                self._size += 1
+            points[key] = (lat, lon)
+
+    def nearest(self, lat, lon, radius_km, accept=None):
+        """ Closest point within radius_km.
+        Args:
+            accept (callable): optional key -> bool filter, e.g. "is still cached"
+        Returns:
+            (key, distance in km) or None
+        """
+        row, col = self.cell(lat, lon)
+        rows = math.ceil(radius_km / self.cell_km)
+        # cells get narrower east-west towards the poles, widen the search to compensate
+        cos_lat = max(math.cos(math.radians(lat)), 0.01)
+        cols = math.ceil(radius_km / (self.cell_km * cos_lat))
+
+        best = None
+        with self._lock:
+            candidates = [(key, point) for r in range(row - rows, row + rows + 1)
+                          for c in range(col - cols, col + cols + 1)
+                          for key, point in self._cells.get((r, c), {}).items()]
+
+        for key, (p_lat, p_lon) in candidates:
+            distance = haversine_km(lat, lon, p_lat, p_lon)
+            if distance <= radius_km and (best is None or distance < best[1]):
+                if accept is None or accept(key):
+                    best = (key, distance)
+        return best
+
+    def prune(self, keep):
+        """ Drop every point whose key fails keep(key) """
+        with self._lock:
+            for cell in list(self._cells):
+                points = self._cells[cell]
+                for key in [key for key in points if not keep(key)]:
+                    del points[key]
+                    self._size -= 1
+                if not points:
+                    del self._cells[cell]
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """ Great-circle distance between two coordinates in km """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * earth_radius_km * math.asin(min(1.0, math.sqrt(a)))